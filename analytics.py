@@ -0,0 +1,244 @@
+"""
+Investor ITR & GST Calculator - Multi-Client Analytics Module
+
+Aggregates processed portfolios across a book of clients without re-running
+the calculator:
+- Each client contributes its summary plus small pre-aggregated rollups
+  (per symbol and FY, per broker)
+- The store keeps them as columnar NumPy arrays with integer codes for
+  clients, symbols, FYs and brokers
+- Queries (gains by symbol, GST per broker, largest unmatched sells) are
+  vectorized reductions such as np.bincount over those codes
+"""
+
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+from dividends import financial_year
+
+
+# Per-client values kept from the summary (plus unmatched sell totals)
+CLIENT_COLUMNS = ['Total STCG', 'Total LTCG', 'Total Dividends', 'Speculative Income',
+                  'Total Brokerage', 'Total GST on Brokerage', 'Final Taxable Income',
+                  'Total Trades Matched', 'Unmatched Sells', 'Unmatched Qty', 'Unmatched Value']
+
+SYMBOL_COLUMNS = ['STCG', 'LTCG', 'Qty', 'Brokerage', 'GST on Brokerage', 'Trades']
+
+BROKER_COLUMNS = ['Brokerage', 'GST on Brokerage', 'Trades']
+
+UNKNOWN_BROKER = 'Unknown'
+
+
+def build_client_rollups(results_df: pd.DataFrame, brokers: Optional[Dict] = None,
+                         unmatched_sells: Optional[List[Dict]] = None) -> Dict:
+    """
+    Pre-aggregate one client's outputs for the analytics store.
+
+    Returns {'symbols': per (Stock, FY) columns, 'brokers': per Broker
+    columns, 'unmatched': unmatched sell totals}, with columns as arrays.
+
+    `results_df` is the calculator's matched trades; `brokers` is
+    InvestorCalculator.brokerage_by_broker(), so broker totals reconcile with
+    the summary; and `unmatched_sells` is InvestorCalculator.unmatched_sells.
+    """
+    if results_df.empty:
+        symbols = pd.DataFrame(columns=['Stock', 'FY'] + SYMBOL_COLUMNS, dtype=float)
+    else:
+        gain = results_df['Gain/Loss']
+        is_ltcg = results_df['Type'].eq('LTCG')
+        symbols = pd.DataFrame({
+            'Stock': results_df['Stock'],
+            'FY': financial_year(pd.to_datetime(results_df['Sell Date'])),
+            'STCG': gain.where(~is_ltcg, 0.0),
+            'LTCG': gain.where(is_ltcg, 0.0),
+            'Qty': results_df['Qty'],
+            'Brokerage': results_df['Brokerage'],
+            'GST on Brokerage': results_df['GST on Brokerage'],
+            'Trades': 1,
+        }).groupby(['Stock', 'FY'], sort=False).sum().reset_index()
+
+    if brokers:
+        # Trades without a broker (or from files without the column) share one bucket
+        names = [broker or UNKNOWN_BROKER for broker in brokers]
+        brokers = (pd.DataFrame(list(brokers.values()), columns=BROKER_COLUMNS).assign(Broker=names)
+                   .groupby('Broker', sort=False).sum().reset_index())
+    else:
+        brokers = pd.DataFrame(columns=['Broker'] + BROKER_COLUMNS, dtype=float)
+
+    unmatched_sells = unmatched_sells or []
+    unmatched = {
+        'Unmatched Qty': float(sum(sell['remaining_qty'] for sell in unmatched_sells)),
+        'Unmatched Value': float(sum(sell['remaining_qty'] * sell['price'] for sell in unmatched_sells)),
+    }
+    # Plain column arrays keep ingestion free of per-column DataFrame overhead
+    return {'symbols': {column: symbols[column].to_numpy() for column in symbols.columns},
+            'brokers': {column: brokers[column].to_numpy() for column in brokers.columns},
+            'unmatched': unmatched}
+
+
+class _Codes:
+    """Dictionary encoding of labels to dense integer codes"""
+
+    def __init__(self, labels=()):
+        self.labels = list(labels)
+        self._codes = {label: code for code, label in enumerate(self.labels)}
+
+    def encode(self, values) -> np.ndarray:
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            code = self._codes.get(value)
+            if code is None:
+                code = self._codes[value] = len(self.labels)
+                self.labels.append(str(value))
+            codes[i] = code
+        return codes
+
+    def lookup(self, label) -> Optional[int]:
+        return self._codes.get(label)
+
+
+class _ColumnTable:
+    """Append-only columnar table; appended blocks are concatenated on first read"""
+
+    def __init__(self, code_columns: List[str], value_columns: List[str]):
+        self.columns = code_columns + value_columns
+        self._data = {column: np.empty(0, dtype=np.int32 if column in code_columns else float)
+                      for column in self.columns}
+        self._pending = []
+
+    def append(self, block: Dict[str, np.ndarray]):
+        self._pending.append(block)
+
+    def data(self) -> Dict[str, np.ndarray]:
+        if self._pending:
+            self._data = {column: np.concatenate([self._data[column]] + [block[column] for block in self._pending])
+                          for column in self.columns}
+            self._pending = []
+        return self._data
+
+    def drop(self, mask: np.ndarray):
+        data = self.data()
+        self._data = {column: values[~mask] for column, values in data.items()}
+
+
+class PortfolioAnalyticsStore:
+    """Cross-client aggregates over ingested summaries and rollups"""
+
+    def __init__(self):
+        self.clients = _Codes()
+        self.symbols = _Codes()
+        self.fys = _Codes()
+        self.brokers = _Codes()
+        self._client_rows = _ColumnTable(['client'], CLIENT_COLUMNS)
+        self._symbol_rows = _ColumnTable(['client', 'symbol', 'fy'], SYMBOL_COLUMNS)
+        self._broker_rows = _ColumnTable(['client', 'broker'], BROKER_COLUMNS)
+
+    def __len__(self):
+        return len(np.unique(self._client_rows.data()['client']))
+
+    def ingest(self, client_id, summary: Dict, rollups: Dict):
+        """Add (or replace) one client's summary and rollups"""
+        if self.clients.lookup(client_id) is not None:
+            self.remove(client_id)
+        client = self.clients.encode([client_id])[0]
+
+        values = {**summary, **rollups['unmatched']}
+        self._client_rows.append({'client': np.array([client], dtype=np.int32),
+                                  **{column: np.array([float(values.get(column, 0.0))]) for column in CLIENT_COLUMNS}})
+
+        symbols = rollups['symbols']
+        self._symbol_rows.append({
+            'client': np.full(len(symbols['Stock']), client, dtype=np.int32),
+            'symbol': self.symbols.encode(symbols['Stock']),
+            'fy': self.fys.encode(symbols['FY']),
+            **{column: np.asarray(symbols[column], dtype=float) for column in SYMBOL_COLUMNS},
+        })
+        brokers = rollups['brokers']
+        self._broker_rows.append({
+            'client': np.full(len(brokers['Broker']), client, dtype=np.int32),
+            'broker': self.brokers.encode(brokers['Broker']),
+            **{column: np.asarray(brokers[column], dtype=float) for column in BROKER_COLUMNS},
+        })
+
+    def ingest_calculator(self, client_id, calculator):
+        """Ingest a calculator that has already run FIFO matching"""
+        rollups = build_client_rollups(calculator.get_results_dataframe(), calculator.brokerage_by_broker(),
+                                       calculator.unmatched_sells)
+        self.ingest(client_id, calculator.calculate_summary(), rollups)
+
+    def remove(self, client_id):
+        """Drop a client's rows (its code stays reserved for re-ingestion)"""
+        client = self.clients.lookup(client_id)
+        if client is None:
+            return
+        for table in (self._client_rows, self._symbol_rows, self._broker_rows):
+            table.drop(table.data()['client'] == client)
+
+    def _fy_mask(self, rows: Dict[str, np.ndarray], fy: Optional[str]) -> np.ndarray:
+        if fy is None:
+            return np.ones(len(rows['fy']), dtype=bool)
+        return rows['fy'] == self.fys.lookup(fy)
+
+    @staticmethod
+    def _client_counts(group: np.ndarray, client: np.ndarray, n_groups: int) -> np.ndarray:
+        """Number of distinct clients per group code"""
+        pairs = np.sort(group.astype(np.int64) << 32 | client.astype(np.int64))
+        distinct = pairs[np.r_[True, pairs[1:] != pairs[:-1]]] if len(pairs) else pairs
+        return np.bincount(distinct >> 32, minlength=n_groups)
+
+    def gains_by_symbol(self, fy: Optional[str] = None) -> pd.DataFrame:
+        """STCG, LTCG and turnover per symbol across all clients (optionally for one FY)"""
+        rows = self._symbol_rows.data()
+        mask = self._fy_mask(rows, fy)
+        symbol = rows['symbol'][mask].astype(np.int64)
+        n = len(self.symbols.labels)
+        table = pd.DataFrame({column: np.bincount(symbol, weights=rows[column][mask], minlength=n)
+                              for column in SYMBOL_COLUMNS},
+                             index=pd.Index(self.symbols.labels, name='Stock'))
+        table['Total Gain'] = table['STCG'] + table['LTCG']
+        table['Clients'] = self._client_counts(symbol, rows['client'][mask], n)
+        table = table[table['Clients'] > 0]
+        return table.sort_values('Total Gain', ascending=False).round(2)
+
+    def gst_by_broker(self) -> pd.DataFrame:
+        """Brokerage and GST on brokerage per broker across all clients"""
+        rows = self._broker_rows.data()
+        broker = rows['broker'].astype(np.int64)
+        n = len(self.brokers.labels)
+        table = pd.DataFrame({column: np.bincount(broker, weights=rows[column], minlength=n)
+                              for column in BROKER_COLUMNS},
+                             index=pd.Index(self.brokers.labels, name='Broker'))
+        table['Clients'] = self._client_counts(broker, rows['client'], n)
+        table = table[table['Clients'] > 0]
+        return table.sort_values('GST on Brokerage', ascending=False).round(2)
+
+    def top_unmatched_sells(self, n: int = 10, by: str = 'Unmatched Value') -> pd.DataFrame:
+        """Clients with the largest unmatched sells"""
+        rows = self._client_rows.data()
+        values = rows[by]
+        n = min(n, len(values))
+        if n == 0:
+            return pd.DataFrame(columns=['Client', 'Unmatched Sells', 'Unmatched Qty', 'Unmatched Value'])
+        # Partial selection of the top n, then sort just those
+        top = np.argpartition(-values, n - 1)[:n]
+        top = top[np.argsort(-values[top], kind='stable')]
+        labels = np.array(self.clients.labels, dtype=object)
+        return pd.DataFrame({
+            'Client': labels[rows['client'][top]],
+            'Unmatched Sells': rows['Unmatched Sells'][top].astype(int),
+            'Unmatched Qty': rows['Unmatched Qty'][top],
+            'Unmatched Value': rows['Unmatched Value'][top].round(2),
+        })
+
+    def client_summaries(self) -> pd.DataFrame:
+        """One row per client with its stored summary values"""
+        rows = self._client_rows.data()
+        labels = np.array(self.clients.labels, dtype=object)
+        return pd.DataFrame({column: rows[column] for column in CLIENT_COLUMNS},
+                            index=pd.Index(labels[rows['client'].astype(np.int64)], name='Client'))
+
+    def totals(self) -> Dict[str, float]:
+        """Book-wide totals of the client summary values"""
+        rows = self._client_rows.data()
+        return {column: round(float(rows[column].sum()), 2) for column in CLIENT_COLUMNS}
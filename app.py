@@ -8,10 +8,56 @@ from investment portfolio CSV data using FIFO method.
 import streamlit as st
 import pandas as pd
 import io
+import time
 from calculator import InvestorCalculator
+from exports import start_export
+from report_model import build_report_model
+from validation import ValidationError
 from datetime import datetime
 
 
+@st.cache_data(show_spinner=False, max_entries=8)
+def process_uploaded_portfolio(file_bytes: bytes, intraday_netting: bool, strict: bool,
+                               opening_balance_bytes: bytes = None):
+    """Process an uploaded trade file, cached on its content and options"""
+    calculator = InvestorCalculator(intraday_netting=intraday_netting)
+    opening_balances = io.BytesIO(opening_balance_bytes) if opening_balance_bytes else None
+    results_df, summary = calculator.process_portfolio(io.BytesIO(file_bytes), strict=strict,
+                                                       opening_balance_file=opening_balances)
+    speculative_trades = calculator.speculative_trades
+    # The view model is built once here, so reruns only render prepared output
+    report_model = None
+    if not results_df.empty or not speculative_trades.empty:
+        report_model = build_report_model(results_df, summary, speculative_trades)
+    return (results_df, summary, calculator.validation_report, report_model,
+            calculator.get_reconciliation_report(), speculative_trades,
+            calculator.calculate_speculative_summary())
+
+
+@st.fragment
+def render_export_job(export_job):
+    """Show a background export's progress, rerunning only this fragment until it finishes"""
+    if not export_job.done:
+        st.progress(export_job.progress, text=export_job.message)
+        time.sleep(0.3)
+        st.rerun(scope="fragment")
+    
+    if export_job.error is not None:
+        st.error(f"❌ {export_job.message}")
+        return
+    st.progress(1.0, text=export_job.message)
+    with open(export_job.destination, 'rb') as bundle:
+        st.download_button(
+            label="📥 Download Export Bundle (ZIP)",
+            data=bundle,
+            file_name=f"tax_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+            mime="application/zip",
+            use_container_width=True
+        )
+    for skipped_format, reason in export_job.manifest['skipped'].items():
+        st.caption(f"Skipped {skipped_format}: {reason}")
+
+
 def main():
     # Page configuration with enhanced settings
     st.set_page_config(
@@ -239,6 +285,21 @@ def main():
             type=['csv'],
             help="Upload your portfolio transactions in CSV format"
         )
+        intraday_netting = st.checkbox(
+            "Treat same-day buy/sell as intraday (speculative income)",
+            value=False,
+            help="Net same-day round trips per stock and report them separately from capital gains"
+        )
+        opening_balance_file = st.file_uploader(
+            "Opening balances / holdings statement (optional)",
+            type=['csv'],
+            help="Holdings transferred in from another broker: Stock, Qty, Buy Date and Price (or Cost), optionally As Of"
+        )
+        skip_invalid_rows = st.checkbox(
+            "Skip invalid rows and continue",
+            value=False,
+            help="Rows that cannot be used are listed in the data quality report instead of stopping processing"
+        )
         with st.expander("See sample data format"):
             sample_df = pd.DataFrame({
                 'Date': ['2023-01-15', '2023-06-20', '2024-02-10'],
@@ -253,18 +314,33 @@ def main():
     # Main content area with enhanced processing
     if uploaded_file is not None:
         try:
-            # Initialize calculator
-            calculator = InvestorCalculator()
-            
             # Enhanced loading animation
             with st.spinner("🔄 Processing your portfolio with AI precision..."):
-                results_df, summary = calculator.process_portfolio(uploaded_file)
+                (results_df, summary, report, report_model, reconciliation,
+                 speculative_trades, speculative_summary) = process_uploaded_portfolio(
+                    uploaded_file.getvalue(), intraday_netting, not skip_invalid_rows,
+                    opening_balance_file.getvalue() if opening_balance_file is not None else None
+                )
+            
+            # Data quality report (skipped rows and warnings)
+            if report is not None and len(report):
+                with st.expander(f"⚠️ Data quality report: {report}"):
+                    st.dataframe(report.to_dataframe(), use_container_width=True, hide_index=True)
+            
+            # Sells with no earlier buys (or opening balance) to match against
+            if len(reconciliation):
+                with st.expander(f"🔎 Unmatched sells: {len(reconciliation)} sell(s) in "
+                                 f"{len(reconciliation.symbols)} stock(s) are not covered by any buy"):
+                    st.markdown("Upload an opening balances file covering these quantities to include their gains.")
+                    st.dataframe(reconciliation.by_symbol(), use_container_width=True)
+                    symbol = st.selectbox("Show sells for", reconciliation.symbols)
+                    st.dataframe(reconciliation.for_symbol(symbol), use_container_width=True, hide_index=True)
             
-            # Mark results available in session state
-            st.session_state['has_results'] = (results_df is not None and not results_df.empty)
+            # Mark results available in session state (all trades may have been netted as intraday)
+            st.session_state['has_results'] = report_model is not None
             
             # Display results with ultra-modern design
-            if not results_df.empty:
+            if report_model is not None:
                 st.markdown("<a id=\"results\"></a>", unsafe_allow_html=True)
                 # Success banner (clean)
                 st.markdown("""
@@ -291,49 +367,14 @@ def main():
                     
                     if not results_df.empty:
                         # Add summary cards first
-                        col1, col2, col3 = st.columns(3)
-                        
-                        with col1:
-                            total_gains = results_df['Gain/Loss'].sum()
-                            gain_color = "#22c55e" if total_gains >= 0 else "#ef4444"
-                            gain_symbol = "+" if total_gains >= 0 else ""
-                            st.markdown(f"""
-                            <div style=\"background:#ecfeff;padding:1rem;border-radius:10px;text-align:center;border:1px solid #bae6fd;\">
-                                <h3 style=\"margin:0 0 0.25rem 0;color:{gain_color};font-size:1.4rem;font-weight:800;\">{gain_symbol}₹{total_gains:,.0f}</h3>
-                                <p style=\"margin:0;color:#0f172a;font-weight:600;\">Total Gains/Loss</p>
-                            </div>
-                            """, unsafe_allow_html=True)
-                        
-                        with col2:
-                            stcg_amount = summary['Total STCG']
-                            st.markdown(f"""
-                            <div style=\"background:#fff7ed;padding:1rem;border-radius:10px;text-align:center;border:1px solid #fed7aa;\">
-                                <h3 style=\"margin:0 0 0.25rem 0;color:#c2410c;font-size:1.4rem;font-weight:800;\">₹{stcg_amount:,.0f}</h3>
-                                <p style=\"margin:0;color:#9a3412;font-weight:600;\">STCG (≤ 12m)</p>
-                            </div>
-                            """, unsafe_allow_html=True)
-                        
-                        with col3:
-                            ltcg_amount = summary['Total LTCG']
-                            st.markdown(f"""
-                            <div style=\"background:#eff6ff;padding:1rem;border-radius:10px;text-align:center;border:1px solid #bfdbfe;\">
-                                <h3 style=\"margin:0 0 0.25rem 0;color:#1d4ed8;font-size:1.4rem;font-weight:800;\">₹{ltcg_amount:,.0f}</h3>
-                                <p style=\"margin:0;color:#1e40af;font-weight:600;\">LTCG (> 12m)</p>
-                            </div>
-                            """, unsafe_allow_html=True)
+                        for column, card in zip(st.columns(3), report_model.itr_cards):
+                            with column:
+                                st.markdown(card, unsafe_allow_html=True)
                         
                         st.markdown("<br>", unsafe_allow_html=True)
                     
                     # Create a simplified stock summary table
                     if not results_df.empty:
-                        # Group by stock and calculate summary
-                        stock_summary = results_df.groupby('Stock').agg({
-                            'Buy Price': 'mean',
-                            'Sell Price': 'mean', 
-                            'Qty': 'sum',
-                            'Gain/Loss': 'sum'
-                        }).round(2)
-                        
                         # Create the preview table using Streamlit's native dataframe with custom styling
                         st.markdown("""
                         <style>
@@ -342,21 +383,9 @@ def main():
                         </style>
                         """, unsafe_allow_html=True)
                         
-                        # Prepare the display dataframe
-                        display_df = stock_summary.copy()
-                        display_df['Buy Price'] = display_df['Buy Price'].apply(lambda x: f"₹{x:,.0f}")
-                        display_df['Sell Price'] = display_df['Sell Price'].apply(lambda x: f"₹{x:,.0f}")
-                        display_df['Qty'] = display_df['Qty'].apply(lambda x: f"{x:,.0f}")
-                        display_df['Gain/Loss'] = display_df['Gain/Loss'].apply(
-                            lambda x: f"₹{x:+,.0f}" if x >= 0 else f"₹{x:,.0f}"
-                        )
-                        
-                        # Rename columns for better display
-                        display_df.columns = ['Buy Price (₹)', 'Sell Price (₹)', 'Quantity', 'Gain/Loss (₹)']
-                        
                         # Display the dataframe
                         st.dataframe(
-                            display_df,
+                            report_model.stock_table,
                             use_container_width=True,
                             height=400
                         )
@@ -365,13 +394,20 @@ def main():
                         st.markdown("<br>", unsafe_allow_html=True)
                         col1, col2, col3 = st.columns([1, 2, 1])
                         with col2:
-                            total_taxable = summary['Final Taxable Income']
-                            st.markdown(f"""
-                            <div style=\"background:#1d4ed8;padding:1rem;border-radius:12px;text-align:center;color:#fff;border:1px solid #1e40af;\">
-                                <h4 style=\"margin:0 0 0.25rem 0;font-weight:700;\">Total Taxable Income</h4>
-                                <h2 style=\"margin:0;font-size:1.8rem;font-weight:900;\">₹{total_taxable:,.0f}</h2>
-                            </div>
-                            """, unsafe_allow_html=True)
+                            st.markdown(report_model.taxable_income_html, unsafe_allow_html=True)
+                    
+                    # Intraday round trips: speculative business income, outside capital gains
+                    if not speculative_trades.empty:
+                        st.markdown("#### ⚡ Intraday (Speculative) Trades")
+                        st.caption("Same-day buy/sell round trips, taxed as speculative business income at slab rates")
+                        metric_columns = st.columns(4)
+                        metric_columns[0].metric("Round Trips", speculative_summary['Intraday Round Trips'])
+                        metric_columns[1].metric("Turnover", f"₹{speculative_summary['Intraday Turnover']:,.2f}")
+                        metric_columns[2].metric("Speculative Income", f"₹{speculative_summary['Speculative Income']:,.2f}")
+                        metric_columns[3].metric("Brokerage + GST", f"₹{speculative_summary['Speculative Brokerage'] + speculative_summary['GST on Speculative Brokerage']:,.2f}")
+                        st.dataframe(speculative_trades, use_container_width=True, hide_index=True)
+                        if results_df.empty:
+                            st.markdown(report_model.taxable_income_html, unsafe_allow_html=True)
                     
                 with tab2:
                     st.markdown("""
@@ -381,50 +417,15 @@ def main():
                     </div>
                     """, unsafe_allow_html=True)
                     
-                    if not results_df.empty:
+                    if report_model is not None:
                         # GST Summary Cards
-                        col1, col2, col3 = st.columns(3)
-                        
-                        with col1:
-                            st.markdown(f"""
-                            <div style=\"background:#f8fafc;padding:1rem;border-radius:10px;text-align:center;border:1px solid #e2e8f0;\">
-                                <h3 style=\"margin:0 0 0.25rem 0;color:#0f172a;font-size:1.4rem;font-weight:800;\">₹{summary['Total Brokerage']:,.0f}</h3>
-                                <p style=\"margin:0;color:#334155;font-weight:600;\">Total Brokerage</p>
-                                <small style=\"color:#64748b;opacity:0.9;\">Before GST</small>
-                            </div>
-                            """, unsafe_allow_html=True)
-                        
-                        with col2:
-                            st.markdown(f"""
-                            <div style=\"background:#fff7ed;padding:1rem;border-radius:10px;text-align:center;border:1px solid #fed7aa;\">
-                                <h3 style=\"margin:0 0 0.25rem 0;color:#c2410c;font-size:1.4rem;font-weight:800;\">₹{summary['Total GST on Brokerage']:,.0f}</h3>
-                                <p style=\"margin:0;color:#9a3412;font-weight:600;\">Total GST (18%)</p>
-                                <small style=\"color:#9a3412;opacity:0.9;\">On brokerage</small>
-                            </div>
-                            """, unsafe_allow_html=True)
-                        
-                        with col3:
-                            total_with_gst = summary['Total Brokerage'] + summary['Total GST on Brokerage']
-                            st.markdown(f"""
-                            <div style=\"background:#f5f3ff;padding:1rem;border-radius:10px;text-align:center;border:1px solid #ddd6fe;\">
-                                <h3 style=\"margin:0 0 0.25rem 0;color:#5b21b6;font-size:1.4rem;font-weight:800;\">₹{total_with_gst:,.0f}</h3>
-                                <p style=\"margin:0;color:#6d28d9;font-weight:600;\">Total with GST</p>
-                                <small style=\"color:#6d28d9;opacity:0.9;\">Brokerage + GST</small>
-                            </div>
-                            """, unsafe_allow_html=True)
+                        for column, card in zip(st.columns(3), report_model.gst_cards):
+                            with column:
+                                st.markdown(card, unsafe_allow_html=True)
                         
                         st.markdown("<br>", unsafe_allow_html=True)
                         
                         
-                        # Create GST breakdown by stock
-                        gst_breakdown = results_df.groupby('Stock').agg({
-                            'Brokerage': 'sum',
-                            'GST on Brokerage': 'sum'
-                        }).round(2)
-                        
-                        # Add calculated columns
-                        gst_breakdown['Total Cost'] = gst_breakdown['Brokerage'] + gst_breakdown['GST on Brokerage']
-                        
                         # Apply custom styling for GST table
                         st.markdown("""
                         <style>
@@ -434,19 +435,10 @@ def main():
                         </style>
                         """, unsafe_allow_html=True)
                         
-                        # Prepare display dataframe for GST
-                        gst_display_df = gst_breakdown.copy()
-                        gst_display_df['Brokerage'] = gst_display_df['Brokerage'].apply(lambda x: f"₹{x:,.2f}")
-                        gst_display_df['GST on Brokerage'] = gst_display_df['GST on Brokerage'].apply(lambda x: f"₹{x:,.2f}")
-                        gst_display_df['Total Cost'] = gst_display_df['Total Cost'].apply(lambda x: f"₹{x:,.2f}")
-                        
-                        # Rename columns for better display
-                        gst_display_df.columns = ['Brokerage (₹)', 'GST Amount (₹)', 'Total Cost (₹)']
-                        
                         # Display the GST dataframe with custom class
                         st.markdown('<div class="gst-dataframe">', unsafe_allow_html=True)
                         st.dataframe(
-                            gst_display_df,
+                            report_model.gst_table,
                             use_container_width=True,
                             height=350
                         )
@@ -459,48 +451,71 @@ def main():
                             <div style="display: grid; gap: 0.5rem; color: #4a5568; font-size: 0.9rem;">
                                 <div style="display: flex; justify-content: space-between; padding: 0.5rem 0; border-bottom: 1px solid #f1f5f9;">
                                     <span>Brokerage Amount:</span>
-                                    <span style="font-weight: 600;">₹{:.2f}</span>
+                                    <span style="font-weight: 600;">{}</span>
                                 </div>
                                 <div style="display: flex; justify-content: space-between; padding: 0.5rem 0; border-bottom: 1px solid #f1f5f9;">
                                     <span>GST Rate:</span>
-                                    <span style="font-weight: 600;">18%</span>
+                                    <span style="font-weight: 600;">{}</span>
                                 </div>
                                 <div style="display: flex; justify-content: space-between; padding: 0.5rem 0; color: #e65100; font-weight: 700;">
                                     <span>Total GST:</span>
-                                    <span>₹{:.2f}</span>
+                                    <span>{}</span>
                                 </div>
                             </div>
                         </div>
-                        """.format(summary['Total Brokerage'], summary['Total GST on Brokerage']), unsafe_allow_html=True)
+                        """.format(*report_model.gst_details.values()), unsafe_allow_html=True)
                 
                 st.markdown("---")
                 
-                # Download Section
-                st.markdown("<a id=\"download\"></a>", unsafe_allow_html=True)
-                st.markdown("""
-                <div style="text-align: center; margin: 1.5rem 0;">
-                    <h3 style="color: #0f172a; font-weight: 700; margin-bottom: 0.75rem;">📥 Download Detailed Results</h3>
-                    <p style="color: #475569; margin-bottom: 1rem; font-size: 0.95rem;">Export trade-by-trade analysis for tax filing</p>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                # Center the download button
-                col1, col2, col3 = st.columns([2, 1, 2])
-                
-                with col2:
-                    # Prepare CSV data for download
-                    csv_buffer = io.StringIO()
-                    results_df.to_csv(csv_buffer, index=False)
-                    csv_data = csv_buffer.getvalue()
+                # Downloads cover matched (delivery) trades
+                if not results_df.empty:
+                    # Download Section
+                    st.markdown("<a id=\"download\"></a>", unsafe_allow_html=True)
+                    st.markdown("""
+                    <div style="text-align: center; margin: 1.5rem 0;">
+                        <h3 style="color: #0f172a; font-weight: 700; margin-bottom: 0.75rem;">📥 Download Detailed Results</h3>
+                        <p style="color: #475569; margin-bottom: 1rem; font-size: 0.95rem;">Export trade-by-trade analysis for tax filing</p>
+                    </div>
+                    """, unsafe_allow_html=True)
                     
-                    st.download_button(
-                        label="📊 Download Report (CSV)",
-                        data=csv_data,
-                        file_name=f"tax_calculation_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                        mime="text/csv",
-                        help="Download complete trade-by-trade analysis for tax filing",
-                        use_container_width=True
-                    )
+                    # Center the download button
+                    col1, col2, col3 = st.columns([2, 1, 2])
+                    
+                    with col2:
+                        # Prepare CSV data for download
+                        csv_buffer = io.StringIO()
+                        results_df.to_csv(csv_buffer, index=False)
+                        csv_data = csv_buffer.getvalue()
+                    
+                        st.download_button(
+                            label="📊 Download Report (CSV)",
+                            data=csv_data,
+                            file_name=f"tax_calculation_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                            mime="text/csv",
+                            help="Download complete trade-by-trade analysis for tax filing",
+                            use_container_width=True
+                        )
+                    
+                    # Full export bundle, streamed to a temp file by a background thread while progress is shown
+                    export_key = (uploaded_file.file_id, intraday_netting, skip_invalid_rows,
+                                  opening_balance_file.file_id if opening_balance_file is not None else None)
+                    col1, col2, col3 = st.columns([2, 1, 2])
+                    with col2:
+                        if st.button("📦 Prepare Export Bundle", use_container_width=True,
+                                     help="Trades CSV, Schedule CG, per-FY Excel workbooks and JSON in one zip"):
+                            # A new job replaces the previous one and deletes its file
+                            _, previous_job = st.session_state.get('export_job', (None, None))
+                            if previous_job is not None:
+                                previous_job.discard()
+                            st.session_state['export_job'] = (export_key, start_export(results_df, summary))
+                    
+                        # A job for other inputs is stale; one left at session end is deleted when collected
+                        job_key, export_job = st.session_state.get('export_job', (None, None))
+                        if export_job is not None and job_key == export_key:
+                            render_export_job(export_job)
+                        elif export_job is not None:
+                            export_job.discard()
+                            del st.session_state['export_job']
 
                 # Required CSV format section moved to last (as text)
                 st.markdown("---")
@@ -524,6 +539,11 @@ def main():
             else:
                 st.warning("⚠️ No trades could be matched. Please check your data format.")
         
+        except ValidationError as e:
+            st.error(f"❌ {e}")
+            st.markdown("Fix the rows below, or tick **Skip invalid rows and continue** to process the rest.")
+            st.dataframe(e.report.to_dataframe(), use_container_width=True, hide_index=True)
+        
         except Exception as e:
             st.error(f"❌ Error processing file: {str(e)}")
             st.markdown("""
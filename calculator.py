@@ -6,19 +6,35 @@ This module contains the core calculation logic for:
 - Capital gains calculation (STCG/LTCG)
 - GST calculation on brokerage
 - Summary calculations for tax reporting
+
+FIFO matching and the summary are plain Python, so importing this module
+does not load pandas or NumPy. They are imported where DataFrames are read
+or produced (CSV loading, intraday netting, dividend statements, results).
 """
 
-import pandas as pd
+from __future__ import annotations
+
+import bisect
+import heapq
 from datetime import datetime, timedelta
-from typing import List, Tuple, Dict
-import numpy as np
+from typing import TYPE_CHECKING, List, Optional, Tuple, Dict
+
+from corporate_actions import AdjustedLots, CorporateActionBook, LotAdjuster, adjust_lot, load_corporate_actions
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# Bump whenever a change alters results, so cached outputs are not reused
+CALCULATOR_VERSION = '3'
 
 
 class Trade:
     """Represents a single trade transaction"""
     
     def __init__(self, date: datetime, trade_type: str, stock: str, 
-                 qty: int, price: float, brokerage: float, dividend: float = 0):
+                 qty: int, price: float, brokerage: float, dividend: float = 0,
+                 broker: Optional[str] = None):
         self.date = date
         self.trade_type = trade_type.upper()
         self.stock = stock
@@ -26,6 +42,8 @@ class Trade:
         self.price = price
         self.brokerage = brokerage
         self.dividend = dividend
+        self.broker = broker  # From the optional Broker column
+        self.as_of = None  # Opening lots: date Qty and Price are stated at (later actions only)
         self.remaining_qty = qty  # For FIFO tracking
     
     def __repr__(self):
@@ -44,6 +62,8 @@ class MatchedTrade:
         self.sell_price = sell_trade.price
         self.buy_brokerage = (buy_trade.brokerage * matched_qty) / buy_trade.qty
         self.sell_brokerage = (sell_trade.brokerage * matched_qty) / sell_trade.qty
+        self.buy_broker = buy_trade.broker
+        self.sell_broker = sell_trade.broker
         self.total_brokerage = self.buy_brokerage + self.sell_brokerage
         
         # Calculate gain/loss
@@ -74,118 +94,447 @@ class MatchedTrade:
             'Gain/Loss': round(self.gain, 2),
             'Type': self.gain_type,
             'GST on Brokerage': round(self.gst_on_brokerage, 2),
-            'Days Held': (self.sell_date - self.buy_date).days
+            'Days Held': (self.sell_date - self.buy_date).days,
+            'Buy Brokerage': round(self.buy_brokerage, 2),
+            'Sell Brokerage': round(self.sell_brokerage, 2)
         }
 
 
 class InvestorCalculator:
     """Main calculator class for processing trades and calculating taxes"""
     
-    def __init__(self):
+    def __init__(self, intraday_netting: bool = False, buy_before_sell: bool = False):
+        self.intraday_netting = intraday_netting  # Route same-day round trips to a speculative bucket
+        self.buy_before_sell = buy_before_sell  # Opt-in same-day tiebreak for FIFO order (default: input order)
         self.trades = []
+        self.trades_sorted = False  # True when self.trades is already in FIFO order
         self.matched_trades = []
         self.buy_trades_by_stock = {}  # For FIFO tracking
         self.unmatched_sells = []  # Track unmatched sell trades
+        self._open_lots = {}  # Buy lots left open after FIFO matching (not yet rescaled)
+        self._lot_adjusters = {}  # Stock -> LotAdjuster holding its corporate action factors
+        self._last_event_date = {}  # Stock -> date of the last trade or event it was matched through
+        self.open_lots_version = {}  # Bumped whenever a stock is re-matched
+        self.matched_trades_by_stock = {}
+        self.unmatched_sells_by_stock = {}
+        self.opening_lots_by_stock = {}  # Lots from opening balances, oldest first
+        self.corporate_actions = CorporateActionBook()
+        self._dividend_ledger = None  # Created on first use
+        self._speculative_trades = None  # Intraday results per (date, stock), once netted
+        self._netted_trade_counts = {}  # Trade rows fully netted away as intraday, per type
+        self._netted_by_broker = {}  # Broker -> [netted brokerage, trade rows fully netted]
+        self.validation_report = None  # Issues found in the last loaded file
+        self._early_sells = None  # Stock and Date of the rows warned as sell_before_buy
+        self._merged_in_lots = {}  # Target stock -> [(merger date, lots)] during matching
+        self._open_lot_index = None
+        self._ltcg_calendar = None
+    
+    @property
+    def open_lots_by_stock(self) -> AdjustedLots:
+        """Buy lots left open after FIFO matching, rescaled for corporate actions when read"""
+        return AdjustedLots(self._open_lots, self._lot_adjusters)
+    
+    @property
+    def dividend_ledger(self):
+        """Dividend statement ledger (created on first use)"""
+        if self._dividend_ledger is None:
+            from dividends import DividendLedger
+            self._dividend_ledger = DividendLedger()
+        return self._dividend_ledger
+    
+    @property
+    def speculative_trades(self) -> pd.DataFrame:
+        """Intraday round trips per (date, stock); empty unless intraday netting ran"""
+        if self._speculative_trades is None:
+            import pandas as pd
+            from intraday import SPECULATIVE_COLUMNS
+            return pd.DataFrame(columns=SPECULATIVE_COLUMNS)
+        return self._speculative_trades
     
-    def load_csv_data(self, csv_file) -> bool:
-        """Load and validate CSV data"""
+    def load_csv_data(self, csv_file, strict: bool = True) -> bool:
+        """
+        Load and validate CSV data.
+        
+        Every row is checked up front and the findings are kept in
+        self.validation_report. In strict mode any row that cannot be used
+        raises ValidationError; otherwise those rows are skipped.
+        """
+        import pandas as pd
+        from itertools import repeat
+        from sorting import sort_order, trade_sort_keys
+        from validation import ValidationError, validate_trades
+        
         try:
             df = pd.read_csv(csv_file)
+            parsed, self.validation_report = validate_trades(df)
             
-            # Validate required columns
-            required_columns = ['Date', 'Type', 'Stock', 'Qty', 'Price', 'Brokerage']
-            missing_columns = [col for col in required_columns if col not in df.columns]
+            if self.validation_report.has_errors:
+                if strict:
+                    raise ValidationError(self.validation_report)
+                parsed = parsed.drop(index=self.validation_report.error_rows)
             
-            if missing_columns:
-                raise ValueError(f"Missing required columns: {missing_columns}")
+            # Opening balances seeded already may cover sells with no earlier buy in the file
+            issues = self.validation_report.issues
+            early_rows = issues.loc[issues['Category'].eq('sell_before_buy'), 'Row']
+            self._early_sells = parsed.loc[early_rows, ['Stock', 'Date']]
+            self._recheck_early_sells()
             
-            # Process each row
-            for _, row in df.iterrows():
-                try:
-                    date = pd.to_datetime(row['Date']).to_pydatetime()
-                    trade_type = str(row['Type']).strip()
-                    stock = str(row['Stock']).strip()
-                    qty = int(row['Qty'])
-                    price = float(row['Price'])
-                    brokerage = float(row['Brokerage'])
-                    
-                    # Handle optional dividend column
-                    dividend = 0
-                    if 'Dividend' in df.columns and pd.notna(row['Dividend']):
-                        dividend = float(row['Dividend'])
-                    
-                    trade = Trade(date, trade_type, stock, qty, price, brokerage, dividend)
-                    self.trades.append(trade)
-                    
-                except (ValueError, TypeError) as e:
-                    raise ValueError(f"Error processing row: {row.to_dict()}. Error: {str(e)}")
+            # Put trades in FIFO order once, skipping the sort if the file already is
+            times, ranks = trade_sort_keys(parsed['Date'], parsed['Type'], self.buy_before_sell)
+            order = sort_order(times, ranks)
+            if order is not None:
+                parsed = parsed.iloc[order]
+            self.trades_sorted = not self.trades
+            
+            # Build trades column-wise from the already parsed values
+            dates = parsed['Date'].dt.to_pydatetime()
+            brokers = parsed['Broker'] if 'Broker' in parsed.columns else repeat(None)
+            for date, trade_type, stock, qty, price, brokerage, dividend, broker in zip(
+                    dates, parsed['Type'], parsed['Stock'], parsed['Qty'].astype(int),
+                    parsed['Price'], parsed['Brokerage'], parsed['Dividend'], brokers):
+                self.trades.append(Trade(date, trade_type, stock, int(qty), float(price),
+                                         float(brokerage), float(dividend), broker))
             
             return True
             
+        except ValidationError:
+            raise
         except Exception as e:
             raise Exception(f"Error loading CSV: {str(e)}")
     
-    def calculate_fifo_matching(self):
-        """Calculate capital gains using FIFO method"""
-        # Clear previous results
-        self.matched_trades = []
-        self.unmatched_sells = []
+    def calculate_fifo_matching(self, stocks=None):
+        """Calculate capital gains using FIFO method (optionally only for the given stocks)"""
+        # Stocks linked by mergers are always re-matched together
+        merger_sources = self.corporate_actions.merger_targets()
+        if stocks is not None:
+            stocks = self._merger_closure(set(stocks), merger_sources)
         
-        # Group trades by stock and sort by date
+        # Group trades by stock
         trades_by_stock = {}
         for trade in self.trades:
+            if stocks is not None and trade.stock not in stocks:
+                continue
             if trade.stock not in trades_by_stock:
                 trades_by_stock[trade.stock] = []
             trades_by_stock[trade.stock].append(trade)
+        for target in merger_sources:
+            if stocks is None or target in stocks:
+                trades_by_stock.setdefault(target, [])
+        for stock in self.opening_lots_by_stock:
+            if stocks is None or stock in stocks:
+                trades_by_stock.setdefault(stock, [])
+        
+        # Clear previous results (only for the stocks being re-matched)
+        if stocks is None:
+            self.matched_trades_by_stock = {}
+            self.unmatched_sells_by_stock = {}
+            self._open_lots = {}
+            self._lot_adjusters = {}
+            self._last_event_date = {}
+        else:
+            for stock in stocks:
+                self.matched_trades_by_stock.pop(stock, None)
+                self.unmatched_sells_by_stock.pop(stock, None)
+                self._open_lots.pop(stock, None)
+                self._lot_adjusters.pop(stock, None)
+                self._last_event_date.pop(stock, None)
+        self._open_lot_index = None
+        self._merged_in_lots = {}
+        
+        # Process FIFO matching for each stock (merged stocks before their targets)
+        for stock in self._merger_order(trades_by_stock, merger_sources):
+            self._match_stock(stock, trades_by_stock[stock])
+            self.open_lots_version[stock] = self.open_lots_version.get(stock, 0) + 1
+        
+        # Flatten per-stock results, keeping stocks in order of first appearance
+        stock_order = {}
+        for trade in self.trades:
+            stock_order.setdefault(trade.stock, len(stock_order))
+        order_key = lambda stock: stock_order.get(stock, len(stock_order))
+        ordered_stocks = sorted(self.matched_trades_by_stock, key=order_key)
+        self.matched_trades = [mt for stock in ordered_stocks for mt in self.matched_trades_by_stock[stock]]
+        ordered_stocks = sorted(self.unmatched_sells_by_stock, key=order_key)
+        self.unmatched_sells = [us for stock in ordered_stocks for us in self.unmatched_sells_by_stock[stock]]
+    
+    @staticmethod
+    def _merger_closure(stocks: set, merger_sources: Dict) -> set:
+        """Extend a set of stocks with every stock linked to them by a merger"""
+        links = {}
+        for target, sources in merger_sources.items():
+            for source in sources:
+                links.setdefault(target, set()).add(source)
+                links.setdefault(source, set()).add(target)
+        pending = list(stocks)
+        while pending:
+            for linked in links.get(pending.pop(), ()):
+                if linked not in stocks:
+                    stocks.add(linked)
+                    pending.append(linked)
+        return stocks
+    
+    @staticmethod
+    def _merger_order(trades_by_stock: Dict, merger_sources: Dict) -> List[str]:
+        """Order stocks so that every merged stock is matched before its target"""
+        ordered, visited = [], set()
+        
+        def visit(stock):
+            if stock in visited:
+                return
+            visited.add(stock)
+            for source in merger_sources.get(stock, ()):
+                if source in trades_by_stock:
+                    visit(source)
+            ordered.append(stock)
         
-        # Sort trades by date for each stock
         for stock in trades_by_stock:
-            trades_by_stock[stock].sort(key=lambda x: x.date)
+            visit(stock)
+        return ordered
+    
+    def _match_stock(self, stock: str, stock_trades: List[Trade]):
+        """Run FIFO matching for a single stock's trades"""
+        # Sort trades by date (then BUY before SELL if configured); stable, so input order breaks ties
+        if not self.trades_sorted:
+            if self.buy_before_sell:
+                stock_trades.sort(key=lambda x: (x.date, x.trade_type != 'BUY'))
+            else:
+                stock_trades.sort(key=lambda x: x.date)
+        for trade in stock_trades:
+            trade.remaining_qty = trade.qty
         
-        # Process FIFO matching for each stock
-        self.matched_trades = []
+        # Opening balances join the stream at their acquisition dates, ahead of same-day trades
+        opening_lots = self.opening_lots_by_stock.get(stock)
+        stated_dates = []
+        if opening_lots:
+            stated_dates = [lot.as_of for lot in opening_lots if lot.as_of is not None]
+            for lot in opening_lots:
+                lot.remaining_qty = lot.qty
+            stock_trades = list(heapq.merge(opening_lots, stock_trades, key=lambda x: x.date))
         
-        for stock, stock_trades in trades_by_stock.items():
-            buy_queue = []  # Queue of buy trades with remaining quantities
+        # Corporate actions and lots merged in from other stocks, in date order
+        events = [(action.date, action, None) for action in self.corporate_actions.actions_for(stock)]
+        events += [(date, None, lots) for date, lots in self._merged_in_lots.pop(stock, [])]
+        events.sort(key=lambda event: event[0])
+        adjuster = LotAdjuster() if events else None
+        next_event = 0
+        # An opening lot stated as of a date already reflects the splits and bonus issues up to it
+        adjustment_dates = sorted(action.date for action in self.corporate_actions.actions_for(stock)
+                                  if action.action_type != 'MERGER')
+        
+        matched_trades = []
+        unmatched_sells = []
+        buy_queue = []  # Queue of buy trades with remaining quantities
+        
+        for trade in stock_trades:
+            # Events take effect from their ex-date, before that day's trades
+            while next_event < len(events) and events[next_event][0] <= trade.date:
+                buy_queue = self._apply_event(stock, events[next_event], buy_queue, adjuster)
+                next_event += 1
             
-            for trade in stock_trades:
-                if trade.trade_type == 'BUY':
-                    buy_queue.append(trade)
+            if trade.trade_type == 'BUY':
+                buy_queue.append(trade)
+                if adjuster and trade.as_of is not None:
+                    adjuster.enter(trade, max(len(adjuster.cumulative) - 1,
+                                              bisect.bisect_right(adjustment_dates, trade.as_of)))
+                elif adjuster:
+                    adjuster.enter(trade)
+            
+            elif trade.trade_type == 'SELL':
+                remaining_sell_qty = trade.qty
                 
-                elif trade.trade_type == 'SELL':
-                    remaining_sell_qty = trade.qty
+                while remaining_sell_qty > 0 and buy_queue:
+                    if adjuster:
+                        buy_queue[0] = adjuster.current(buy_queue[0])
+                    buy_trade = buy_queue[0]
+                    
+                    if buy_trade.remaining_qty <= 0:
+                        buy_queue.pop(0)
+                        continue
                     
-                    while remaining_sell_qty > 0 and buy_queue:
-                        buy_trade = buy_queue[0]
-                        
-                        if buy_trade.remaining_qty <= 0:
-                            buy_queue.pop(0)
-                            continue
-                        
-                        # Match quantity (minimum of remaining buy and sell quantities)
-                        matched_qty = min(buy_trade.remaining_qty, remaining_sell_qty)
-                        
-                        # Create matched trade
-                        matched_trade = MatchedTrade(buy_trade, trade, matched_qty)
-                        self.matched_trades.append(matched_trade)
-                        
-                        # Update remaining quantities
-                        buy_trade.remaining_qty -= matched_qty
-                        remaining_sell_qty -= matched_qty
-                        
-                        # Remove buy trade if fully consumed
-                        if buy_trade.remaining_qty <= 0:
-                            buy_queue.pop(0)
+                    # Match quantity (minimum of remaining buy and sell quantities)
+                    matched_qty = min(buy_trade.remaining_qty, remaining_sell_qty)
                     
-                    # If there's remaining sell quantity, it means insufficient buy trades
-                    # Store this information for reporting instead of printing warnings
-                    if remaining_sell_qty > 0:
-                        self.unmatched_sells.append({
-                            'stock': stock,
-                            'date': trade.date,
-                            'remaining_qty': remaining_sell_qty,
-                            'price': trade.price
-                        })
+                    # Create matched trade
+                    matched_trade = MatchedTrade(buy_trade, trade, matched_qty)
+                    matched_trades.append(matched_trade)
+                    
+                    # Update remaining quantities
+                    buy_trade.remaining_qty -= matched_qty
+                    remaining_sell_qty -= matched_qty
+                    
+                    # Remove buy trade if fully consumed
+                    if buy_trade.remaining_qty <= 0:
+                        buy_queue.pop(0)
+                
+                # If there's remaining sell quantity, it means insufficient buy trades
+                # Store this information for reporting instead of printing warnings
+                if remaining_sell_qty > 0:
+                    unmatched_sells.append({
+                        'stock': stock,
+                        'date': trade.date,
+                        'remaining_qty': remaining_sell_qty,
+                        'price': trade.price
+                    })
+        
+        # Events after the last trade still adjust the open lots
+        for event in events[next_event:]:
+            buy_queue = self._apply_event(stock, event, buy_queue, adjuster)
+        
+        if matched_trades:
+            self.matched_trades_by_stock[stock] = matched_trades
+        if unmatched_sells:
+            self.unmatched_sells_by_stock[stock] = unmatched_sells
+        last_dates = [stock_trades[-1].date] if stock_trades else []
+        if events:
+            last_dates.append(events[-1][0])
+        last_dates += stated_dates
+        if last_dates:
+            self._last_event_date[stock] = max(last_dates)
+        
+        # Whatever is left in the queue is the open position for this stock; the
+        # adjuster keeps its factors so the lots are only rescaled when read
+        open_lots = [lot for lot in buy_queue if lot.remaining_qty > 0]
+        if open_lots:
+            self._open_lots[stock] = open_lots
+            if adjuster:
+                adjuster.retain(open_lots)
+                self._lot_adjusters[stock] = adjuster
+    
+    def _apply_event(self, stock: str, event: Tuple, buy_queue: List[Trade], adjuster) -> List[Trade]:
+        """Apply a corporate action or merged-in lots to a stock's buy queue"""
+        date, action, merged_lots = event
+        
+        if merged_lots is not None:
+            # Merged lots keep their acquisition dates, so they slot into FIFO order
+            for lot in merged_lots:
+                bisect.insort(buy_queue, lot, key=lambda x: x.date)
+                adjuster.enter(lot)
+            return buy_queue
+        
+        if action.action_type == 'MERGER':
+            # Open lots move to the new stock; this stock's queue is emptied
+            lots = [adjust_lot(adjuster.current(lot), action.factor, action.new_stock)
+                    for lot in buy_queue if lot.remaining_qty > 0]
+            self._merged_in_lots.setdefault(action.new_stock, []).append((date, lots))
+            return []
+        
+        # Splits and bonus issues only record a new factor; lots are rescaled when touched
+        adjuster.apply(action.factor)
+        return buy_queue
+    
+    def apply_intraday_netting(self):
+        """Move same-day round trips to the speculative bucket, leaving delivery residuals in self.trades"""
+        if not self.trades:
+            return
+        import pandas as pd
+        from intraday import net_intraday
+        
+        frame = pd.DataFrame({
+            'Date': [trade.date for trade in self.trades],
+            'Type': [trade.trade_type for trade in self.trades],
+            'Stock': [trade.stock for trade in self.trades],
+            'Qty': [trade.qty for trade in self.trades],
+            'Price': [trade.price for trade in self.trades],
+            'Brokerage': [trade.brokerage for trade in self.trades],
+        })
+        self._speculative_trades, residual = net_intraday(frame)
+        
+        # Untouched rows keep their Trade; partly netted rows are cut down to the delivery quantity
+        delivery = []
+        for trade, qty in zip(self.trades, residual.to_numpy()):
+            if qty == trade.qty:
+                delivery.append(trade)
+                continue
+            netted = self._netted_by_broker.setdefault(trade.broker, [0.0, 0])
+            netted[0] += trade.brokerage * (trade.qty - qty) / trade.qty
+            if qty > 0 or trade.dividend > 0:
+                brokerage = trade.brokerage * qty / trade.qty
+                delivery.append(Trade(trade.date, trade.trade_type, trade.stock, int(qty),
+                                      trade.price, brokerage, trade.dividend, trade.broker))
+            else:
+                # Still a trade for the summary counts, though nothing of it is left for FIFO
+                self._netted_trade_counts[trade.trade_type] = self._netted_trade_counts.get(trade.trade_type, 0) + 1
+                netted[1] += 1
+        self.trades = delivery
+    
+    def calculate_speculative_summary(self) -> Dict:
+        """Calculate summary of intraday (speculative) trades"""
+        from intraday import summarize_speculative
+        return summarize_speculative(self.speculative_trades)
+    
+    def add_trades(self, trades: List[Trade]):
+        """Add new trades and re-run FIFO matching only for the stocks they touch"""
+        self.trades.extend(trades)
+        self.trades_sorted = False
+        self.calculate_fifo_matching(stocks={trade.stock for trade in trades})
+    
+    def add_corporate_actions(self, actions: List):
+        """
+        Record corporate actions and bring the results up to date.
+        
+        A split or bonus issue dated after everything a stock was matched
+        through cannot change its matched trades: it only extends the stock's
+        factor, in O(1). Anything else re-runs FIFO matching for the stocks it affects.
+        """
+        rematch = set()
+        for action in actions:
+            last_date = self._last_event_date.get(action.stock)
+            rescale_only = (action.action_type != 'MERGER' and action.stock not in rematch
+                            and last_date is not None and action.date > last_date)
+            self.corporate_actions.add(action)
+            if not rescale_only:
+                rematch.add(action.stock)
+                continue
+            self._lot_adjusters.setdefault(action.stock, LotAdjuster()).apply(action.factor)
+            self._last_event_date[action.stock] = action.date
+            self.open_lots_version[action.stock] = self.open_lots_version.get(action.stock, 0) + 1
+            self._open_lot_index = None
+        if rematch:
+            self.calculate_fifo_matching(stocks=rematch)
+    
+    def _seed_opening_lots(self, lots_by_stock: Dict[str, List[Trade]]) -> int:
+        for stock, lots in lots_by_stock.items():
+            merged = self.opening_lots_by_stock.get(stock, []) + lots
+            merged.sort(key=lambda lot: lot.date)  # Stable: earlier statements first on ties
+            self.opening_lots_by_stock[stock] = merged
+        self._recheck_early_sells()
+        return sum(len(lots) for lots in lots_by_stock.values())
+    
+    def _recheck_early_sells(self):
+        """Drop sell_before_buy warnings for sells that an opening lot dated on or before them covers"""
+        if self._early_sells is None or self._early_sells.empty or not self.opening_lots_by_stock:
+            return
+        import pandas as pd
+        opened = self._early_sells['Stock'].map(
+            {stock: lots[0].date for stock, lots in self.opening_lots_by_stock.items() if lots})
+        covered = pd.to_datetime(opened) <= self._early_sells['Date']
+        self.validation_report.drop_issues('sell_before_buy', self._early_sells.index[covered])
+        self._early_sells = self._early_sells[~covered]
+    
+    def add_opening_lots(self, lots_by_stock: Dict[str, List[Trade]]) -> int:
+        """Seed the lot book with opening lots and re-run FIFO matching for their stocks"""
+        count = self._seed_opening_lots(lots_by_stock)
+        self.calculate_fifo_matching(stocks=set(lots_by_stock))
+        return count
+    
+    def load_opening_balances(self, balance_file) -> int:
+        """Load an opening-balance / holdings statement and seed the lot book; returns the lot count"""
+        from opening_balances import load_opening_balances, opening_lots
+        return self.add_opening_lots(opening_lots(load_opening_balances(balance_file)))
+    
+    def get_reconciliation_report(self):
+        """Get the sells still uncovered after matching, per symbol"""
+        from opening_balances import ReconciliationReport
+        return ReconciliationReport(self.unmatched_sells_by_stock)
+    
+    def load_dividend_statement(self, statement_file) -> int:
+        """Stream a dividend statement into the ledger (load trades, opening balances and corporate actions first for per-share rows)"""
+        from dividends import HoldingsTimeline
+        opening = [lot for lots in self.opening_lots_by_stock.values() for lot in lots]
+        return self.dividend_ledger.load(statement_file, HoldingsTimeline(self.trades + opening, self.corporate_actions))
+    
+    def load_corporate_actions(self, actions_file):
+        """Load corporate actions (splits, bonus issues, mergers) from CSV"""
+        self.add_corporate_actions(load_corporate_actions(actions_file))
     
     def calculate_summary(self) -> Dict:
         """Calculate summary statistics for tax reporting"""
@@ -194,27 +543,72 @@ class InvestorCalculator:
         total_gst = sum(mt.gst_on_brokerage for mt in self.matched_trades)
         total_dividends = sum(trade.dividend for trade in self.trades if trade.dividend > 0)
         
+        # Dividends and TDS from dividend statements (pre-aggregated per stock and FY)
+        total_tds = 0.0
+        if self._dividend_ledger is not None:
+            ledger_totals = self._dividend_ledger.totals()
+            total_dividends += ledger_totals['Amount']
+            total_tds = ledger_totals['TDS']
+        
         # Calculate total brokerage
         total_brokerage = sum(trade.brokerage for trade in self.trades)
         
+        # Intraday round trips are speculative business income; their brokerage and GST still count
+        speculative_income = 0.0
+        if self._speculative_trades is not None:
+            speculative = self.calculate_speculative_summary()
+            speculative_income = speculative['Speculative Income']
+            total_brokerage += speculative['Speculative Brokerage']
+            total_gst += speculative['GST on Speculative Brokerage']
+        
         # Final taxable income calculation
-        taxable_income = total_stcg + total_ltcg + total_dividends
+        taxable_income = total_stcg + total_ltcg + total_dividends + speculative_income
         
         return {
             'Total STCG': round(total_stcg, 2),
             'Total LTCG': round(total_ltcg, 2),
             'Total Dividends': round(total_dividends, 2),
+            'Total TDS on Dividends': round(total_tds, 2),
+            'Speculative Income': round(speculative_income, 2),
             'Total Brokerage': round(total_brokerage, 2),
             'Total GST on Brokerage': round(total_gst, 2),
             'Final Taxable Income': round(taxable_income, 2),
             'Total Trades Matched': len(self.matched_trades),
-            'Total Buy Trades': len([t for t in self.trades if t.trade_type == 'BUY']),
-            'Total Sell Trades': len([t for t in self.trades if t.trade_type == 'SELL']),
+            'Total Buy Trades': len([t for t in self.trades if t.trade_type == 'BUY'])
+                                + self._netted_trade_counts.get('BUY', 0),
+            'Total Sell Trades': len([t for t in self.trades if t.trade_type == 'SELL'])
+                                 + self._netted_trade_counts.get('SELL', 0),
             'Unmatched Sells': len(self.unmatched_sells)
         }
     
+    def brokerage_by_broker(self) -> Dict:
+        """
+        Brokerage, GST and trade counts per broker (None when the file had no Broker column).
+        
+        Built from the trades actually used, so the totals reconcile with
+        calculate_summary: brokerage covers every trade, while GST follows the
+        matched quantities and the intraday round trips.
+        """
+        totals = {}
+        
+        def row(broker):
+            return totals.setdefault(broker, {'Brokerage': 0.0, 'GST on Brokerage': 0.0, 'Trades': 0})
+        
+        for trade in self.trades:
+            row(trade.broker)['Brokerage'] += trade.brokerage
+            row(trade.broker)['Trades'] += 1
+        for broker, (brokerage, trades) in self._netted_by_broker.items():
+            row(broker)['Brokerage'] += brokerage
+            row(broker)['GST on Brokerage'] += brokerage * 0.18
+            row(broker)['Trades'] += trades
+        for mt in self.matched_trades:
+            row(mt.buy_broker)['GST on Brokerage'] += mt.buy_brokerage * 0.18
+            row(mt.sell_broker)['GST on Brokerage'] += mt.sell_brokerage * 0.18
+        return totals
+    
     def get_results_dataframe(self) -> pd.DataFrame:
         """Get matched trades as DataFrame for display and export"""
+        import pandas as pd
         if not self.matched_trades:
             return pd.DataFrame()
         
@@ -222,10 +616,66 @@ class InvestorCalculator:
         df = pd.DataFrame(results)
         return df
     
-    def process_portfolio(self, csv_file) -> Tuple[pd.DataFrame, Dict]:
+    def index_open_lots(self, stocks=None):
+        """Columnar index of the open lots of all (or the given) stocks, rescaled for corporate actions"""
+        from positions import OpenLotIndex
+        lots, factors = [], []
+        for stock in self._open_lots if stocks is None else stocks:
+            stock_lots = self._open_lots.get(stock, [])
+            adjuster = self._lot_adjusters.get(stock)
+            lots += stock_lots
+            factors += adjuster.factors(stock_lots) if adjuster else [1.0] * len(stock_lots)
+        return OpenLotIndex(lots, factors)
+    
+    def get_open_lot_index(self):
+        """Get the columnar index of open lots (built once per FIFO run)"""
+        if self._open_lot_index is None:
+            self._open_lot_index = self.index_open_lots()
+        return self._open_lot_index
+    
+    def get_ltcg_calendar(self):
+        """Get the memoized LTCG eligibility calendar for open lots"""
+        if self._ltcg_calendar is None:
+            from positions import LTCGCalendar
+            self._ltcg_calendar = LTCGCalendar(self)
+        return self._ltcg_calendar
+    
+    def get_open_positions_dataframe(self, as_of: datetime = None, by_lot: bool = False) -> pd.DataFrame:
+        """Get open positions per symbol (or per lot) with cost basis and holding age"""
+        index = self.get_open_lot_index()
+        return index.lots_dataframe(as_of) if by_lot else index.positions_dataframe(as_of)
+    
+    def value_open_positions(self, prices, as_of: datetime = None) -> Tuple[pd.DataFrame, Dict]:
+        """Value open positions from a price file or mapping and project STCG/LTCG"""
+        import pandas as pd
+        from positions import load_price_file, summarize_valuation
+        if not isinstance(prices, (dict, pd.Series)):
+            prices = load_price_file(prices)
+        positions = self.get_open_lot_index().value(prices, as_of)
+        return positions, summarize_valuation(positions)
+    
+    def calculate_tax_liability(self, rules=None, brought_forward: Dict = None,
+                                other_income: float = 0) -> Dict:
+        """Calculate tax liability line items from the current summary"""
+        from tax_engine import compute_tax_liability
+        return compute_tax_liability(self.calculate_summary(), rules, brought_forward, other_income)
+    
+    def process_portfolio(self, csv_file, corporate_actions_file=None,
+                          dividend_file=None, strict: bool = True,
+                          opening_balance_file=None) -> Tuple[pd.DataFrame, Dict]:
         """Main method to process portfolio and return results"""
         # Load data
-        self.load_csv_data(csv_file)
+        self.load_csv_data(csv_file, strict)
+        if self.intraday_netting:
+            self.apply_intraday_netting()
+        if opening_balance_file is not None:
+            from opening_balances import load_opening_balances, opening_lots
+            self._seed_opening_lots(opening_lots(load_opening_balances(opening_balance_file)))
+        if corporate_actions_file is not None:
+            for action in load_corporate_actions(corporate_actions_file):
+                self.corporate_actions.add(action)
+        if dividend_file is not None:
+            self.load_dividend_statement(dividend_file)
         
         # Calculate FIFO matching
         self.calculate_fifo_matching()
@@ -0,0 +1,204 @@
+"""
+Investor ITR & GST Calculator - Corporate Actions Module
+
+This module handles corporate actions that change a holding without a trade:
+- Stock splits (e.g. 1 share becomes 5)
+- Bonus issues (e.g. 1 bonus share for every 1 held)
+- Mergers (shares of one stock are exchanged for shares of another)
+
+Actions are never written back into historical trades. Each stock keeps a
+running product of its adjustment factors; FIFO matching records the factor
+in force when a lot enters the buy queue and only rescales a lot's quantity
+and price when the lot is actually touched. The factor state outlives
+matching, so open lots are rescaled when they are read, and a later split or
+bonus only extends the product. Applying an action is therefore O(1) however
+many lots are open, and the original acquisition date is kept so holding
+periods run on unbroken.
+"""
+
+from collections.abc import Mapping
+from datetime import datetime
+from fractions import Fraction
+from typing import Dict, List, Optional
+
+
+ACTION_TYPES = ('SPLIT', 'BONUS', 'MERGER')
+
+
+class CorporateAction:
+    """Represents a split, bonus issue or merger effective from `date` (the ex-date)"""
+
+    def __init__(self, date: datetime, action_type: str, stock: str,
+                 new: int, old: int = 1, new_stock: Optional[str] = None):
+        self.date = date
+        self.action_type = action_type.upper()
+        self.stock = stock
+        self.new = new
+        self.old = old
+        self.new_stock = new_stock
+
+        if self.action_type not in ACTION_TYPES:
+            raise ValueError(f"Unknown corporate action type: {action_type}")
+        if new <= 0 or old <= 0:
+            raise ValueError(f"Invalid ratio {new}:{old} for {stock}")
+        if self.action_type == 'MERGER' and not new_stock:
+            raise ValueError(f"Merger of {stock} needs a new stock")
+
+    @property
+    def factor(self) -> Fraction:
+        """Multiplier applied to the quantity of every open lot"""
+        if self.action_type == 'BONUS':
+            # `new` bonus shares for every `old` held
+            return Fraction(self.old + self.new, self.old)
+        # Splits and mergers: `new` shares for every `old`
+        return Fraction(self.new, self.old)
+
+    def __repr__(self):
+        target = f" -> {self.new_stock}" if self.new_stock else ""
+        return f"CorporateAction({self.date.date()}, {self.action_type}, {self.stock}{target}, {self.new}:{self.old})"
+
+
+class CorporateActionBook:
+    """Per-stock corporate actions, kept in ex-date order"""
+
+    def __init__(self):
+        self.actions_by_stock = {}
+
+    def add(self, action: CorporateAction):
+        """Record an action; appending in date order is O(1)"""
+        actions = self.actions_by_stock.setdefault(action.stock, [])
+        actions.append(action)
+        if len(actions) > 1 and actions[-2].date > action.date:
+            actions.sort(key=lambda a: a.date)
+
+    def actions_for(self, stock: str) -> List[CorporateAction]:
+        return self.actions_by_stock.get(stock, [])
+
+    def merger_targets(self) -> Dict[str, List[str]]:
+        """Map each merger target stock to the stocks merged into it"""
+        sources = {}
+        for stock, actions in self.actions_by_stock.items():
+            for action in actions:
+                if action.action_type == 'MERGER':
+                    sources.setdefault(action.new_stock, []).append(stock)
+        return sources
+
+    def __len__(self):
+        return sum(len(actions) for actions in self.actions_by_stock.values())
+
+
+class LotAdjuster:
+    """
+    Lazily applies a stock's cumulative adjustment factor to lots in its buy queue.
+
+    `cumulative[i]` is the product of the first i action factors. A lot
+    remembers the epoch it was last brought up to date at (0 if it was never
+    registered); when it is touched, it is rescaled by
+    cumulative[now] / cumulative[epoch]. A lot entered at a future epoch
+    (already stated after actions not yet applied) is left alone until
+    actions beyond that epoch arrive.
+    """
+
+    def __init__(self):
+        self.cumulative = [Fraction(1)]
+        self.epochs = {}
+
+    def enter(self, lot, epoch: Optional[int] = None):
+        """Register a lot as current as of `epoch` (default: now)"""
+        self.epochs[id(lot)] = len(self.cumulative) - 1 if epoch is None else epoch
+
+    def apply(self, factor: Fraction):
+        """Apply a new factor to every lot in the queue in O(1)"""
+        self.cumulative.append(self.cumulative[-1] * factor)
+
+    def _epoch(self, lot) -> int:
+        return min(self.epochs.get(id(lot), 0), len(self.cumulative) - 1)
+
+    def factor(self, lot) -> Fraction:
+        """Factor that brings a lot from its epoch to the current one"""
+        return self.cumulative[-1] / self.cumulative[self._epoch(lot)]
+
+    def factors(self, lots) -> List[float]:
+        """Current factor of each lot, as floats for columnar reporting"""
+        scale = [float(self.cumulative[-1] / cumulative) for cumulative in self.cumulative]
+        return [scale[self._epoch(lot)] for lot in lots]
+
+    def current(self, lot):
+        """Return the lot rescaled to the current epoch (the same object if unchanged)"""
+        if self.epochs.get(id(lot), 0) >= len(self.cumulative) - 1:
+            return lot  # Current, or entered at an epoch still ahead
+        factor = self.factor(lot)
+        self.epochs.pop(id(lot), None)
+        if factor != 1:
+            lot = adjust_lot(lot, factor)
+        self.enter(lot)
+        return lot
+
+    def adjusted(self, lot):
+        """Rescaled copy of a lot for reporting, leaving the recorded epochs alone"""
+        factor = self.factor(lot)
+        return adjust_lot(lot, factor) if factor != 1 else lot
+
+    def retain(self, lots):
+        """Forget the epochs of every lot except `lots` (the ones left open)"""
+        self.epochs = {id(lot): self.epochs.get(id(lot), 0) for lot in lots}
+
+
+class AdjustedLots(Mapping):
+    """Read-only view of open lots per stock, rescaled to the stock's current factor on access"""
+
+    def __init__(self, lots_by_stock: Dict[str, List], adjusters: Dict[str, LotAdjuster]):
+        self.lots_by_stock = lots_by_stock
+        self.adjusters = adjusters
+
+    def __getitem__(self, stock: str) -> List:
+        lots = self.lots_by_stock[stock]
+        adjuster = self.adjusters.get(stock)
+        return lots if adjuster is None else [adjuster.adjusted(lot) for lot in lots]
+
+    def __iter__(self):
+        return iter(self.lots_by_stock)
+
+    def __len__(self):
+        return len(self.lots_by_stock)
+
+
+def _scale_qty(qty, factor: Fraction):
+    scaled = qty * factor
+    return int(scaled) if scaled.denominator == 1 else float(scaled)
+
+
+def adjust_lot(lot, factor: Fraction, stock: Optional[str] = None):
+    """Copy of a buy lot with quantity scaled by `factor` and price scaled inversely"""
+    from calculator import Trade
+    adjusted = Trade(lot.date, lot.trade_type, stock or lot.stock,
+                     _scale_qty(lot.qty, factor), float(lot.price / factor), lot.brokerage,
+                     broker=lot.broker)
+    adjusted.remaining_qty = _scale_qty(lot.remaining_qty, factor)
+    return adjusted
+
+
+def load_corporate_actions(actions_file) -> List[CorporateAction]:
+    """
+    Load corporate actions from CSV.
+
+    Required columns: Date, Action (SPLIT/BONUS/MERGER), Stock, New, Old.
+    Optional column: New Stock (required for mergers).
+    """
+    import pandas as pd
+    df = pd.read_csv(actions_file)
+
+    required_columns = ['Date', 'Action', 'Stock', 'New', 'Old']
+    missing_columns = [col for col in required_columns if col not in df.columns]
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {missing_columns}")
+
+    dates = pd.to_datetime(df['Date'])
+    new_stocks = df['New Stock'] if 'New Stock' in df.columns else pd.Series(None, index=df.index)
+    actions = []
+    for date, action_type, stock, new, old, new_stock in zip(
+            dates, df['Action'], df['Stock'], df['New'], df['Old'], new_stocks):
+        actions.append(CorporateAction(
+            date.to_pydatetime(), str(action_type).strip(), str(stock).strip(), int(new), int(old),
+            str(new_stock).strip() if pd.notna(new_stock) else None))
+    return actions
@@ -0,0 +1,199 @@
+"""
+Investor ITR & GST Calculator - Dividend Ledger Module
+
+This module ingests dividend statements separately from trade files:
+- Streams large statements in chunks
+- Aggregates dividend amount and TDS per stock and per financial year
+- Computes entitlement from holdings on the record date when only a
+  per-share rate is given
+
+Only the compact (Stock, FY) aggregate is kept in memory, and all of the
+work is vectorized with pandas/NumPy.
+"""
+
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+
+LEDGER_COLUMNS = ['Amount', 'TDS', 'Records']
+
+
+def financial_year(dates: pd.Series) -> pd.Series:
+    """Indian financial year label (April-March), e.g. 'FY 2024-25', for each date"""
+    start = dates.dt.year - (dates.dt.month < 4).astype(int)
+    end = (start + 1) % 100
+    return 'FY ' + start.astype(str) + '-' + end.astype(str).str.zfill(2)
+
+
+class HoldingsTimeline:
+    """
+    Net quantity held per stock over time, built from trades.
+
+    Trades are sorted on a composite (stock code, day) key with a running
+    quantity per stock, so holdings for many (stock, date) pairs are looked
+    up with a single searchsorted call.
+
+    With a CorporateActionBook, splits and bonus issues are applied by
+    keeping the running quantity in pre-action units (each trade divided by
+    the stock's cumulative factor on its date) and scaling lookups by the
+    factor in force on the record date; mergers move the holding to the new
+    stock on the merger date.
+    """
+
+    def __init__(self, trades: List, actions=None):
+        stocks = [trade.stock for trade in trades]
+        days = np.array([trade.date for trade in trades], dtype='datetime64[D]').astype(np.int64)
+        # Opening lots are stated in units as of their As Of date rather than their buy date
+        unit_days = np.array([trade.as_of or trade.date for trade in trades],
+                             dtype='datetime64[D]').astype(np.int64)
+        signed_qty = [trade.qty if trade.trade_type == 'BUY' else -trade.qty for trade in trades]
+
+        self._factors = {}  # Stock -> (ex-days, cumulative split/bonus factor from each ex-day)
+        mergers = []
+        if actions is not None:
+            for stock, stock_actions in actions.actions_by_stock.items():
+                adjustments = [action for action in stock_actions if action.action_type != 'MERGER']
+                if adjustments:
+                    ex_days = np.array([action.date for action in adjustments], dtype='datetime64[D]')
+                    self._factors[stock] = (ex_days.astype(np.int64),
+                                            np.cumprod([float(action.factor) for action in adjustments]))
+                mergers += [action for action in stock_actions if action.action_type == 'MERGER']
+        self._build(np.array(stocks, dtype=object), days, np.array(signed_qty, dtype=float), unit_days)
+
+        # Mergers in date order, so a chain of mergers carries the holding along
+        for merger in sorted(mergers, key=lambda action: action.date):
+            merger_date = pd.Series([pd.Timestamp(merger.date)])
+            held = float(self.holdings_before(pd.Series([merger.stock]), merger_date)[0])
+            if held > 0:
+                stocks += [merger.stock, merger.new_stock]
+                merger_days = merger_date.to_numpy(dtype='datetime64[D]').astype(np.int64).repeat(2)
+                days = np.append(days, merger_days)
+                unit_days = np.append(unit_days, merger_days)
+                signed_qty += [-held, held * float(merger.factor)]
+                self._build(np.array(stocks, dtype=object), days, np.array(signed_qty, dtype=float), unit_days)
+
+    def _factor_at(self, stocks: np.ndarray, days: np.ndarray) -> np.ndarray:
+        """Cumulative split/bonus factor of each stock in force on each day (ex-dates inclusive)"""
+        factor = np.ones(len(days))
+        for stock, (ex_days, cumulative) in self._factors.items():
+            mask = stocks == stock
+            if mask.any():
+                factor[mask] = np.r_[1.0, cumulative][np.searchsorted(ex_days, days[mask], side='right')]
+        return factor
+
+    def _build(self, stocks: np.ndarray, days: np.ndarray, signed_qty: np.ndarray, unit_days: np.ndarray):
+        # Quantities are kept in pre-action units, so later actions don't rewrite the history
+        signed_qty = signed_qty / self._factor_at(stocks, unit_days)
+        codes, symbols = pd.factorize(stocks)
+        self.symbols = pd.Index(symbols)
+        keys = self._keys(codes, days)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.codes = codes[order]
+
+        # Running quantity restarts at each stock
+        running = np.cumsum(signed_qty[order])
+        starts = np.r_[True, self.codes[1:] != self.codes[:-1]] if len(order) else np.array([], dtype=bool)
+        offset = np.where(starts, running - signed_qty[order], np.nan)
+        self.held = running - pd.Series(offset).ffill().to_numpy()
+
+    @staticmethod
+    def _keys(codes: np.ndarray, days: np.ndarray) -> np.ndarray:
+        return codes.astype(np.int64) * (1 << 32) + (days + (1 << 31))
+
+    def holdings_before(self, stocks: pd.Series, dates: pd.Series) -> np.ndarray:
+        """Quantity held from trades dated strictly before each (stock, date) pair"""
+        codes = self.symbols.get_indexer(stocks)
+        days = dates.to_numpy(dtype='datetime64[D]').astype(np.int64)
+        if len(self.keys) == 0:
+            return np.zeros(len(codes))
+
+        position = np.searchsorted(self.keys, self._keys(codes, days), side='left') - 1
+        safe = np.clip(position, 0, None)
+        found = (codes >= 0) & (position >= 0) & (self.codes[safe] == codes)
+        held = self.held[safe] * self._factor_at(np.asarray(stocks, dtype=object), days)
+        return np.where(found, np.maximum(held, 0.0), 0.0)
+
+
+class DividendLedger:
+    """Per-stock, per-FY dividend and TDS totals"""
+
+    def __init__(self):
+        self.index = pd.DataFrame(
+            {column: pd.Series(dtype=float) for column in LEDGER_COLUMNS},
+            index=pd.MultiIndex.from_arrays([[], []], names=['Stock', 'FY']))
+
+    def load(self, statement_file, holdings: Optional[HoldingsTimeline] = None,
+             chunksize: int = 200000) -> int:
+        """
+        Stream a dividend statement into the ledger and return the number of rows read.
+
+        Required columns: Date, Stock, and either Amount or Per Share.
+        Optional columns: Record Date, TDS. When Amount is blank, the
+        entitlement is Per Share x shares held before the record date (or
+        the payment date if no record date is given).
+        """
+        rows = 0
+        for chunk in pd.read_csv(statement_file, chunksize=chunksize):
+            self.add(chunk, holdings)
+            rows += len(chunk)
+        return rows
+
+    def add(self, statement: pd.DataFrame, holdings: Optional[HoldingsTimeline] = None):
+        """Aggregate a block of dividend statement rows into the ledger"""
+        missing_columns = [col for col in ['Date', 'Stock'] if col not in statement.columns]
+        if missing_columns:
+            raise ValueError(f"Missing required columns: {missing_columns}")
+        if 'Amount' not in statement.columns and 'Per Share' not in statement.columns:
+            raise ValueError("Dividend statement needs an 'Amount' or 'Per Share' column")
+
+        stocks = statement['Stock'].astype(str).str.strip()
+        dates = pd.to_datetime(statement['Date'])
+
+        def column(name):
+            if name in statement.columns:
+                return pd.to_numeric(statement[name], errors='coerce')
+            return pd.Series(np.nan, index=statement.index)
+
+        amount = column('Amount')
+        per_share = column('Per Share')
+        needs_entitlement = amount.isna() & per_share.notna()
+        if needs_entitlement.any():
+            if holdings is None:
+                raise ValueError("Per-share dividends need trades loaded to compute entitlement")
+            record_dates = pd.to_datetime(statement['Record Date']) if 'Record Date' in statement.columns else dates
+            record_dates = record_dates.fillna(dates)
+            held = holdings.holdings_before(stocks[needs_entitlement], record_dates[needs_entitlement])
+            amount = amount.copy()
+            amount[needs_entitlement] = per_share[needs_entitlement].to_numpy() * held
+
+        block = pd.DataFrame({
+            'Stock': stocks,
+            'FY': financial_year(dates),
+            'Amount': amount.fillna(0.0),
+            'TDS': column('TDS').fillna(0.0),
+            'Records': 1.0,
+        }).groupby(['Stock', 'FY']).sum()
+        self.index = self.index.add(block, fill_value=0.0)
+
+    def __len__(self):
+        return int(self.index['Records'].sum())
+
+    def totals(self) -> Dict:
+        """Overall dividend and TDS totals"""
+        return {
+            'Amount': round(float(self.index['Amount'].sum()), 2),
+            'TDS': round(float(self.index['TDS'].sum()), 2),
+        }
+
+    def by_fy(self) -> pd.DataFrame:
+        """Dividend and TDS totals per financial year"""
+        return self.index.groupby(level='FY').sum().round(2).reset_index()
+
+    def by_stock(self, fy: Optional[str] = None) -> pd.DataFrame:
+        """Dividend and TDS totals per stock, optionally for one financial year"""
+        index = self.index
+        if fy is not None:
+            index = index.xs(fy, level='FY', drop_level=False)
+        return index.groupby(level='Stock').sum().round(2).reset_index()
@@ -0,0 +1,270 @@
+"""
+Investor ITR & GST Calculator - Export Bundle Module
+
+Builds every export artifact from the calculator outputs into one zip:
+- Detailed trades and tax summary (CSV)
+- Schedule CG rows: Section 111A (STCG) and 112A (LTCG) per transfer (CSV)
+- One Excel workbook per financial year (needs the optional openpyxl package)
+- Summary and trades as JSON for filing software
+
+Each artifact is streamed into its zip entry chunk by chunk, so memory use
+does not grow with the number of formats. ExportJob runs the build in a
+background thread and exposes progress for the UI.
+"""
+
+import io
+import json
+import os
+import tempfile
+import threading
+import weakref
+import zipfile
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import pandas as pd
+
+from dividends import financial_year
+
+
+EXPORT_FORMATS = ['csv', 'schedule_cg', 'excel', 'json']
+
+SCHEDULE_CG_COLUMNS = ['Financial Year', 'Section', 'Stock', 'Quantity', 'Date of Acquisition',
+                       'Date of Transfer', 'Full Value of Consideration', 'Cost of Acquisition',
+                       'Expenditure on Transfer', 'Capital Gain']
+
+# Excel sheets hold at most 1,048,576 rows; larger years continue on another sheet
+EXCEL_SHEET_ROWS = 1000000
+
+
+def schedule_cg_dataframe(results_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Schedule CG rows (one per matched transfer) from a results DataFrame.
+
+    Buy brokerage is part of the cost of acquisition; only sell brokerage is
+    expenditure on transfer. No matched trades give an empty frame with the
+    Schedule CG columns.
+    """
+    if results_df.empty:
+        return pd.DataFrame(columns=SCHEDULE_CG_COLUMNS)
+    return pd.DataFrame({
+        'Financial Year': financial_year(pd.to_datetime(results_df['Sell Date'])),
+        'Section': results_df['Type'].map({'STCG': '111A', 'LTCG': '112A'}),
+        'Stock': results_df['Stock'],
+        'Quantity': results_df['Qty'],
+        'Date of Acquisition': results_df['Buy Date'],
+        'Date of Transfer': results_df['Sell Date'],
+        'Full Value of Consideration': results_df['Sell Value'],
+        'Cost of Acquisition': (results_df['Buy Value'] + results_df['Buy Brokerage']).round(2),
+        'Expenditure on Transfer': results_df['Sell Brokerage'],
+        'Capital Gain': results_df['Gain/Loss'],
+    }, index=results_df.index)[SCHEDULE_CG_COLUMNS]
+
+
+def _json_default(value):
+    # NumPy scalars from summaries and pandas aggregations
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
+def _open_entry(bundle: zipfile.ZipFile, name: str, compress: bool = True):
+    info = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+    info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    return bundle.open(info, 'w', force_zip64=True)
+
+
+class _Progress:
+    """Turns rows written per artifact into an overall fraction for a callback"""
+
+    def __init__(self, callback: Optional[Callable[[float, str], None]], total_units: int):
+        self.callback = callback
+        self.total_units = max(total_units, 1)
+        self.done_units = 0
+
+    def advance(self, units: int, message: str):
+        self.done_units += units
+        if self.callback is not None:
+            self.callback(min(self.done_units / self.total_units, 1.0), message)
+
+
+def _write_csv(bundle, name, results_df, chunk_rows, progress, transform=None):
+    with _open_entry(bundle, name) as raw, io.TextIOWrapper(raw, encoding='utf-8', newline='') as out:
+        for start in range(0, max(len(results_df), 1), chunk_rows):
+            chunk = results_df.iloc[start:start + chunk_rows]
+            if transform is not None:
+                chunk = transform(chunk)
+            # A frame without columns (no matched trades at all) leaves the entry empty
+            if len(chunk.columns):
+                chunk.to_csv(out, header=start == 0, index=False)
+            progress.advance(len(chunk), f"Writing {name}")
+
+
+def _write_json(bundle, name, results_df, summary, chunk_rows, progress):
+    with _open_entry(bundle, name) as raw, io.TextIOWrapper(raw, encoding='utf-8') as out:
+        out.write('{"summary": ')
+        json.dump(summary, out, default=_json_default)
+        out.write(', "trades": [')
+        for start in range(0, len(results_df), chunk_rows):
+            chunk = results_df.iloc[start:start + chunk_rows]
+            records = chunk.to_json(orient='records', double_precision=2)
+            if start:
+                out.write(', ')
+            out.write(records[1:-1])
+            progress.advance(len(chunk), f"Writing {name}")
+        out.write(']}\n')
+
+
+def _write_excel(bundle, results_df, chunk_rows, progress) -> List[str]:
+    from openpyxl import Workbook
+
+    schedule_years = financial_year(pd.to_datetime(results_df['Sell Date']))
+    written = []
+    for year in sorted(schedule_years.unique()):
+        rows = results_df[(schedule_years == year).to_numpy()]
+        workbook = Workbook(write_only=True)
+
+        totals = schedule_cg_dataframe(rows).groupby('Section')[
+            ['Full Value of Consideration', 'Cost of Acquisition', 'Expenditure on Transfer', 'Capital Gain']].sum()
+        sheet = workbook.create_sheet('Summary')
+        sheet.append(['Financial Year', year])
+        sheet.append([])
+        sheet.append(['Section'] + list(totals.columns))
+        for section, values in totals.round(2).iterrows():
+            sheet.append([section] + values.tolist())
+
+        sheet = None
+        for start in range(0, len(rows), chunk_rows):
+            chunk = schedule_cg_dataframe(rows.iloc[start:start + chunk_rows])
+            for offset, values in enumerate(chunk.itertuples(index=False, name=None)):
+                if (start + offset) % EXCEL_SHEET_ROWS == 0:
+                    part = (start + offset) // EXCEL_SHEET_ROWS
+                    sheet = workbook.create_sheet('Schedule CG' + (f' ({part + 1})' if part else ''))
+                    sheet.append(SCHEDULE_CG_COLUMNS)
+                sheet.append(list(values))
+            progress.advance(len(chunk), f"Writing Excel workbook for {year}")
+
+        name = f"excel/schedule_cg_{year.replace(' ', '_')}.xlsx"
+        # Workbooks are already deflate-compressed; store them as they are
+        with _open_entry(bundle, name, compress=False) as out:
+            workbook.save(out)
+        written.append(name)
+    return written
+
+
+def build_export_bundle(results_df: pd.DataFrame, summary: Dict, destination,
+                        formats: Optional[List[str]] = None,
+                        progress: Optional[Callable[[float, str], None]] = None,
+                        chunk_rows: int = 50000) -> Dict:
+    """
+    Write the export artifacts into a zip at `destination` (path or binary file).
+
+    `progress(fraction, message)` is called as rows are written. Returns a
+    manifest of the entries written and of formats that were skipped (Excel
+    when openpyxl is not installed).
+    """
+    formats = formats if formats is not None else EXPORT_FORMATS
+    unknown = [fmt for fmt in formats if fmt not in EXPORT_FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown export formats: {unknown}")
+
+    skipped = {}
+    if 'excel' in formats:
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            skipped['excel'] = "openpyxl is not installed"
+    active = [fmt for fmt in formats if fmt not in skipped]
+
+    manifest = {'created': datetime.now().isoformat(timespec='seconds'), 'rows': len(results_df),
+                'entries': [], 'skipped': skipped}
+    tracker = _Progress(progress, len(results_df) * len(active))
+    with zipfile.ZipFile(destination, 'w', compression=zipfile.ZIP_DEFLATED) as bundle:
+        if 'csv' in active:
+            _write_csv(bundle, 'trades.csv', results_df, chunk_rows, tracker)
+            with _open_entry(bundle, 'summary.csv') as raw, io.TextIOWrapper(raw, encoding='utf-8', newline='') as out:
+                pd.DataFrame(list(summary.items()), columns=['Item', 'Amount']).to_csv(out, index=False)
+            manifest['entries'] += ['trades.csv', 'summary.csv']
+        if 'schedule_cg' in active:
+            _write_csv(bundle, 'schedule_cg.csv', results_df, chunk_rows, tracker, schedule_cg_dataframe)
+            manifest['entries'].append('schedule_cg.csv')
+        if 'excel' in active and not results_df.empty:
+            manifest['entries'] += _write_excel(bundle, results_df, chunk_rows, tracker)
+        if 'json' in active:
+            _write_json(bundle, 'portfolio.json', results_df, summary, chunk_rows, tracker)
+            manifest['entries'].append('portfolio.json')
+
+        with _open_entry(bundle, 'manifest.json') as raw, io.TextIOWrapper(raw, encoding='utf-8') as out:
+            json.dump(manifest, out, indent=2)
+    if progress is not None:
+        progress(1.0, "Export bundle ready")
+    return manifest
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class ExportJob:
+    """
+    Export bundle built in a background thread, with progress for the UI.
+
+    `destination` may be a path or a binary file object such as BytesIO.
+    Without one the bundle goes to a new temporary file owned by the job: it
+    is deleted by discard(), when the job is garbage collected (e.g. with the
+    UI session holding it) or at interpreter exit.
+    """
+
+    def __init__(self, results_df: pd.DataFrame, summary: Dict, destination: Optional[str] = None,
+                 formats: Optional[List[str]] = None):
+        self._cleanup = None
+        if destination is None:
+            handle, destination = tempfile.mkstemp(prefix='tax_export_', suffix='.zip')
+            os.close(handle)
+            self._cleanup = weakref.finalize(self, _remove_file, destination)
+        self.destination = destination
+        self.progress = 0.0
+        self.message = "Queued"
+        self.manifest = None
+        self.error = None
+        self._discarded = False
+        self._thread = threading.Thread(target=self._run, args=(results_df, summary, formats), daemon=True)
+
+    def _update(self, fraction: float, message: str):
+        self.progress = fraction
+        self.message = message
+
+    def _run(self, results_df, summary, formats):
+        try:
+            self.manifest = build_export_bundle(results_df, summary, self.destination, formats, self._update)
+        except Exception as e:
+            self.error = e
+            self.message = f"Export failed: {e}"
+        finally:
+            if self._discarded and self._cleanup is not None:
+                self._cleanup()
+
+    def start(self) -> 'ExportJob':
+        self._thread.start()
+        return self
+
+    @property
+    def done(self) -> bool:
+        return self._thread.ident is not None and not self._thread.is_alive()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait up to `timeout` seconds; returns whether the job has finished"""
+        self._thread.join(timeout)
+        return self.done
+
+    def discard(self):
+        """Delete the job's temporary bundle now, or as soon as a running build finishes"""
+        self._discarded = True
+        if self._cleanup is not None and not self._thread.is_alive():
+            self._cleanup()
+
+
+def start_export(results_df: pd.DataFrame, summary: Dict, destination: Optional[str] = None,
+                 formats: Optional[List[str]] = None) -> ExportJob:
+    """Start building an export bundle in the background"""
+    return ExportJob(results_df, summary, destination, formats).start()
@@ -0,0 +1,71 @@
+"""
+Investor ITR & GST Calculator - Intraday Netting Module
+
+Same-day BUY and SELL trades of a stock are intraday (speculative business
+income) rather than capital gains. This module nets them before FIFO
+matching:
+- Per (date, stock), the lesser of bought and sold quantity is intraday
+- Rows are consumed in input order on each side until that quantity is used up
+- Whatever is left of each row is delivery and goes on to FIFO matching
+
+Everything is a grouped, vectorized operation over the (date, stock) keys.
+"""
+
+from typing import Dict, Tuple
+import numpy as np
+import pandas as pd
+
+
+SPECULATIVE_COLUMNS = ['Date', 'Stock', 'Qty', 'Buy Value', 'Sell Value', 'Brokerage',
+                       'Gain/Loss', 'GST on Brokerage']
+
+
+def net_intraday(trades: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Split trades into intraday round trips and delivery residuals.
+
+    `trades` has Date, Type, Stock, Qty, Price and Brokerage columns.
+    Returns the speculative results per (date, stock) and the delivery
+    quantity left on each input row (aligned to its index).
+    """
+    day = pd.to_datetime(trades['Date']).dt.normalize()
+    is_buy = trades['Type'].str.upper().eq('BUY')
+    qty = trades['Qty'].astype(float)
+    keys = [day, trades['Stock']]
+
+    bought = qty.where(is_buy, 0.0).groupby(keys).transform('sum')
+    sold = qty.where(~is_buy, 0.0).groupby(keys).transform('sum')
+    intraday_qty = np.minimum(bought, sold)
+
+    # Consume each side in input order until the intraday quantity is used up
+    cumulative = qty.groupby(keys + [is_buy]).cumsum()
+    consumed = (intraday_qty - (cumulative - qty)).clip(lower=0).clip(upper=qty)
+    residual = qty - consumed
+
+    share = np.divide(consumed, qty, out=np.zeros(len(qty)), where=qty.to_numpy() > 0)
+    value = consumed * trades['Price']
+    legs = pd.DataFrame({
+        'Date': day,
+        'Stock': trades['Stock'],
+        'Qty': consumed.where(is_buy, 0.0),
+        'Buy Value': value.where(is_buy, 0.0),
+        'Sell Value': value.where(~is_buy, 0.0),
+        'Brokerage': trades['Brokerage'] * share,
+    })[consumed > 0]
+
+    speculative = legs.groupby(['Date', 'Stock'], sort=True).sum().reset_index()
+    speculative['Gain/Loss'] = speculative['Sell Value'] - speculative['Buy Value'] - speculative['Brokerage']
+    speculative['GST on Brokerage'] = speculative['Brokerage'] * 0.18
+    speculative['Date'] = speculative['Date'].dt.strftime('%Y-%m-%d')
+    return speculative[SPECULATIVE_COLUMNS].round(2), residual
+
+
+def summarize_speculative(speculative: pd.DataFrame) -> Dict:
+    """Summary of the speculative (intraday) bucket"""
+    return {
+        'Intraday Round Trips': len(speculative),
+        'Intraday Turnover': round(float(speculative['Buy Value'].sum() + speculative['Sell Value'].sum()), 2),
+        'Speculative Income': round(float(speculative['Gain/Loss'].sum()), 2),
+        'Speculative Brokerage': round(float(speculative['Brokerage'].sum()), 2),
+        'GST on Speculative Brokerage': round(float(speculative['GST on Brokerage'].sum()), 2),
+    }
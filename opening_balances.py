@@ -0,0 +1,171 @@
+"""
+Investor ITR & GST Calculator - Opening Balances Module
+
+Holdings transferred in from another broker have no BUY rows in the trade
+file, so their sells cannot be matched. This module:
+- Imports an opening-balance / holdings statement (Stock, Qty, Buy Date and
+  Price or Cost) in one vectorized pass
+- Turns it into buy lots per stock, which seed FIFO matching at their
+  historical acquisition dates
+- Reports, per symbol, the sells that are still uncovered after matching
+
+Quantities and prices are taken as stated on the statement's As Of date
+(default: the day it is loaded), so corporate actions on or before that date
+are not applied to them again; only later ones are.
+"""
+
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+
+
+OPENING_BALANCE_COLUMNS = ['Stock', 'Qty', 'Buy Date']
+
+RECONCILIATION_COLUMNS = ['Stock', 'Sell Date', 'Uncovered Qty', 'Sell Price', 'Uncovered Value']
+
+
+def parse_opening_balances(df: pd.DataFrame, as_of=None) -> pd.DataFrame:
+    """
+    Validate and normalise a holdings statement.
+
+    Required columns: Stock, Qty, Buy Date, and Price (per unit) or Cost
+    (total). Optional columns: Brokerage (paid at acquisition) and As Of
+    (date the quantity and price are stated at; blank or missing means
+    `as_of`, which defaults to today). Returns Stock, Qty, Buy Date, As Of,
+    Price and Brokerage columns; raises ValueError listing the CSV lines
+    that cannot be used.
+    """
+    missing_columns = [col for col in OPENING_BALANCE_COLUMNS if col not in df.columns]
+    if 'Price' not in df.columns and 'Cost' not in df.columns:
+        missing_columns.append('Price or Cost')
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {missing_columns}")
+
+    df = df.reset_index(drop=True)
+    qty = pd.to_numeric(df['Qty'], errors='coerce')
+    if 'Price' in df.columns:
+        price = pd.to_numeric(df['Price'], errors='coerce')
+    else:
+        price = pd.to_numeric(df['Cost'], errors='coerce') / qty
+    brokerage = (pd.to_numeric(df['Brokerage'], errors='coerce').fillna(0.0)
+                 if 'Brokerage' in df.columns else pd.Series(0.0, index=df.index))
+    # Strip the distinct names only, then broadcast back
+    codes, uniques = pd.factorize(df['Stock'])
+    names = np.append(pd.Index(uniques.astype(str)).str.strip().to_numpy(dtype=object), None)
+    stock = pd.Series(names[codes], index=df.index, dtype=object)
+
+    default_as_of = pd.Timestamp(as_of) if as_of is not None else pd.Timestamp.today().normalize()
+    raw_as_of = df['As Of'] if 'As Of' in df.columns else pd.Series(np.nan, index=df.index)
+    stated = pd.to_datetime(raw_as_of, errors='coerce')
+
+    parsed = pd.DataFrame({
+        'Stock': stock,
+        'Qty': qty,
+        'Buy Date': pd.to_datetime(df['Buy Date'], errors='coerce'),
+        'As Of': stated.fillna(default_as_of),
+        'Price': price,
+        'Brokerage': brokerage,
+    })
+    invalid = (parsed['Stock'].isna() | parsed['Stock'].eq('') | parsed['Buy Date'].isna()
+               | ~(parsed['Qty'] > 0) | ~(parsed['Price'] >= 0) | (parsed['Brokerage'] < 0)
+               | (stated.isna() & raw_as_of.notna()) | (parsed['As Of'] < parsed['Buy Date']))
+    if invalid.any():
+        lines = (invalid[invalid].index + 2).tolist()  # 1-based CSV line, after the header
+        shown = ', '.join(str(line) for line in lines[:20]) + (' ...' if len(lines) > 20 else '')
+        raise ValueError(f"Invalid opening balance rows ({len(lines)}) at lines: {shown}")
+    return parsed
+
+
+def load_opening_balances(source, as_of=None) -> pd.DataFrame:
+    """Load and validate a holdings statement CSV"""
+    return parse_opening_balances(pd.read_csv(source), as_of)
+
+
+def opening_lots(balances: pd.DataFrame) -> Dict[str, List]:
+    """Buy lots per stock, oldest first (ties keep statement order), from parsed balances"""
+    from calculator import Trade
+
+    stock_codes, symbols = pd.factorize(balances['Stock'])
+    days = balances['Buy Date'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    order = np.lexsort((np.arange(len(balances)), days, stock_codes))
+
+    dates = balances['Buy Date'].dt.to_pydatetime()[order]
+    as_of_dates = balances['As Of'].dt.to_pydatetime()[order]
+    lots = []
+    for date, as_of, stock, qty, price, brokerage in zip(
+            dates, as_of_dates, balances['Stock'].to_numpy()[order],
+            _quantities(balances['Qty'].to_numpy()[order]),
+            balances['Price'].to_numpy(dtype=float)[order].tolist(),
+            balances['Brokerage'].to_numpy(dtype=float)[order].tolist()):
+        lot = Trade(date, 'BUY', stock, qty, price, brokerage)
+        lot.as_of = as_of
+        lots.append(lot)
+
+    # Lots are grouped by stock after the sort; split at the group boundaries
+    sorted_codes = stock_codes[order]
+    bounds = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1], True])
+    return {symbols[sorted_codes[start]]: lots[start:end]
+            for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist())}
+
+
+def _quantities(qty: np.ndarray) -> list:
+    # Whole quantities stay ints (as for trades); fractional units (e.g. after a split) stay floats
+    qty = qty.astype(float)
+    whole = qty == np.floor(qty)
+    return [int(q) if w else q for q, w in zip(qty.tolist(), whole.tolist())]
+
+
+class ReconciliationReport:
+    """Sells still uncovered after FIFO matching, indexed by symbol"""
+
+    def __init__(self, unmatched_sells_by_stock: Dict[str, List[Dict]]):
+        stocks, dates, qty, price = [], [], [], []
+        for stock in sorted(unmatched_sells_by_stock):
+            for sell in unmatched_sells_by_stock[stock]:
+                stocks.append(stock)
+                dates.append(sell['date'])
+                qty.append(sell['remaining_qty'])
+                price.append(sell['price'])
+        qty = np.array(qty, dtype=float)
+        price = np.array(price, dtype=float)
+        self.sells = pd.DataFrame({
+            'Stock': pd.Series(stocks, dtype=object),
+            'Sell Date': pd.to_datetime(pd.Series(dates, dtype=object)).dt.strftime('%Y-%m-%d'),
+            'Uncovered Qty': qty,
+            'Sell Price': price,
+            'Uncovered Value': (qty * price).round(2),
+        }, columns=RECONCILIATION_COLUMNS)
+        # Rows are grouped by stock: keep each stock's row range for O(1) lookup
+        starts = np.flatnonzero(np.r_[True, self.sells['Stock'].to_numpy()[1:] != self.sells['Stock'].to_numpy()[:-1]]) \
+            if len(stocks) else np.array([], dtype=int)
+        ends = np.append(starts[1:], len(stocks))
+        self._ranges = {stocks[start]: (start, end) for start, end in zip(starts.tolist(), ends.tolist())}
+
+    def __len__(self):
+        return len(self.sells)
+
+    @property
+    def symbols(self) -> List[str]:
+        return list(self._ranges)
+
+    def for_symbol(self, stock: str) -> pd.DataFrame:
+        """Uncovered sells of one symbol (empty if it is fully covered)"""
+        start, end = self._ranges.get(stock, (0, 0))
+        return self.sells.iloc[start:end]
+
+    def by_symbol(self) -> pd.DataFrame:
+        """
+        One row per symbol with uncovered sells: count, quantity, value and
+        the first uncovered sell date. 'Uncovered Qty' is the opening
+        balance that would be needed to cover them.
+        """
+        grouped = self.sells.groupby('Stock', sort=True)
+        return pd.DataFrame({
+            'Uncovered Sells': grouped.size(),
+            'Uncovered Qty': grouped['Uncovered Qty'].sum(),
+            'Uncovered Value': grouped['Uncovered Value'].sum().round(2),
+            'First Uncovered Sell': grouped['Sell Date'].min(),
+        })
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return self.sells.copy()
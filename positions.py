@@ -0,0 +1,199 @@
+"""
+Investor ITR & GST Calculator - Open Positions Module
+
+This module reports the lots left open after FIFO matching:
+- Per-lot and per-symbol remaining quantity, cost basis and holding age
+- Valuation of open positions against a price snapshot
+- Projected STCG/LTCG if the positions were sold on a given date
+- An LTCG eligibility calendar answering how much of a holding is long-term on a date
+
+Open lots are held in a columnar index (NumPy arrays keyed by integer symbol
+codes), so revaluing against a new price snapshot is a handful of vectorized
+operations regardless of the number of symbols.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Union
+import numpy as np
+import pandas as pd
+
+
+# A lot is long-term once it has been held for more than this many days
+LTCG_THRESHOLD_DAYS = 365
+
+
+class OpenLotIndex:
+    """Columnar index of buy lots with remaining quantity after FIFO matching"""
+
+    def __init__(self, lots: List, factors: Optional[List[float]] = None):
+        # `factors` rescales each lot for corporate actions not yet applied to it
+        factors = np.ones(len(lots)) if factors is None else np.asarray(factors, dtype=float)
+        is_open = np.array([lot.remaining_qty > 0 for lot in lots], dtype=bool)
+        if not is_open.all():
+            lots = [lot for lot, keep in zip(lots, is_open.tolist()) if keep]
+            factors = factors[is_open]
+
+        self.stocks = np.array([lot.stock for lot in lots], dtype=object)
+        raw_qty = np.array([lot.remaining_qty for lot in lots], dtype=float)
+        self.qty = raw_qty * factors
+        self.buy_price = np.array([lot.price for lot in lots], dtype=float) / factors
+        self.buy_dates = np.array([lot.date for lot in lots], dtype='datetime64[D]')
+
+        # Buy brokerage is apportioned to the open quantity, as in MatchedTrade
+        brokerage = np.array([lot.brokerage for lot in lots], dtype=float)
+        lot_qty = np.array([lot.qty for lot in lots], dtype=float)
+        self.cost_basis = self.qty * self.buy_price + np.divide(
+            brokerage * raw_qty, lot_qty, out=np.zeros_like(brokerage), where=lot_qty > 0)
+
+        # Integer symbol codes let per-symbol work run through bincount/take
+        codes, symbols = pd.factorize(self.stocks, sort=True)
+        self.codes = codes.astype(np.int64)
+        self.symbols = pd.Index(symbols, name='Stock')
+
+    def __len__(self):
+        return len(self.qty)
+
+    @staticmethod
+    def _as_of(as_of: Optional[datetime]) -> np.datetime64:
+        return np.datetime64(as_of or datetime.now(), 'D')
+
+    def _per_symbol(self, values: np.ndarray) -> np.ndarray:
+        return np.bincount(self.codes, weights=values, minlength=len(self.symbols))
+
+    def lots_dataframe(self, as_of: Optional[datetime] = None) -> pd.DataFrame:
+        """Per-lot remaining quantity, cost basis and holding age"""
+        days_held = (self._as_of(as_of) - self.buy_dates).astype(np.int64)
+        return pd.DataFrame({
+            'Stock': self.stocks,
+            'Buy Date': np.datetime_as_string(self.buy_dates),
+            'Qty': self.qty,
+            'Buy Price': self.buy_price.round(2),
+            'Cost Basis': self.cost_basis.round(2),
+            'Days Held': days_held,
+            'Type': np.where(days_held > LTCG_THRESHOLD_DAYS, 'LTCG', 'STCG'),
+        })
+
+    def positions_dataframe(self, as_of: Optional[datetime] = None) -> pd.DataFrame:
+        """Per-symbol remaining quantity, cost basis and quantity-weighted holding age"""
+        days_held = (self._as_of(as_of) - self.buy_dates).astype(np.int64)
+        qty = self._per_symbol(self.qty)
+        cost = self._per_symbol(self.cost_basis)
+        weighted_days = self._per_symbol(days_held * self.qty)
+        return pd.DataFrame({
+            'Qty': qty,
+            'Cost Basis': cost.round(2),
+            'Avg Cost': np.divide(cost, qty, out=np.zeros_like(cost), where=qty > 0).round(2),
+            'Avg Days Held': np.divide(weighted_days, qty, out=np.zeros_like(qty), where=qty > 0).round(0),
+            'Open Lots': np.bincount(self.codes, minlength=len(self.symbols)),
+        }, index=self.symbols).reset_index()
+
+    def value(self, prices: Union[pd.Series, Dict[str, float]],
+              as_of: Optional[datetime] = None) -> pd.DataFrame:
+        """
+        Value open positions at the given prices and project STCG/LTCG if sold on `as_of`.
+
+        Symbols missing from `prices` get a NaN market price and are left out
+        of the projected gains.
+        """
+        prices = pd.Series(prices, dtype=float)
+        symbol_price = prices.reindex(self.symbols).to_numpy()
+        lot_price = symbol_price[self.codes]
+
+        days_held = (self._as_of(as_of) - self.buy_dates).astype(np.int64)
+        is_ltcg = days_held > LTCG_THRESHOLD_DAYS
+        gain = np.nan_to_num(lot_price * self.qty - self.cost_basis)
+
+        positions = self.positions_dataframe(as_of)
+        market_value = symbol_price * positions['Qty'].to_numpy()
+        positions['Market Price'] = symbol_price.round(2)
+        positions['Market Value'] = market_value.round(2)
+        positions['Unrealized Gain'] = (market_value - positions['Cost Basis'].to_numpy()).round(2)
+        positions['Projected STCG'] = self._per_symbol(np.where(is_ltcg, 0.0, gain)).round(2)
+        positions['Projected LTCG'] = self._per_symbol(np.where(is_ltcg, gain, 0.0)).round(2)
+        return positions
+
+
+class LTCGCalendar:
+    """
+    Memoized timeline of the dates on which open lots turn long-term.
+
+    For each stock the lots' maturity dates (first day with more than
+    LTCG_THRESHOLD_DAYS days held) are sorted once, with prefix sums of
+    quantity and cost basis, so "how much is LTCG-eligible on date D" is a
+    binary search. Entries are rebuilt lazily, and only for stocks whose
+    open lots changed since they were cached (see InvestorCalculator.add_trades).
+    """
+
+    def __init__(self, calculator):
+        self.calculator = calculator
+        self._cache = {}  # stock -> (version, maturity dates, cumulative qty, cumulative cost)
+
+    def invalidate(self, stocks=None):
+        """Drop cached timelines for the given stocks (or all of them)"""
+        if stocks is None:
+            self._cache.clear()
+        else:
+            for stock in stocks:
+                self._cache.pop(stock, None)
+
+    def _entry(self, stock: str):
+        version = self.calculator.open_lots_version.get(stock, 0)
+        entry = self._cache.get(stock)
+        if entry is None or entry[0] != version:
+            index = self.calculator.index_open_lots([stock])
+            maturity = index.buy_dates + np.timedelta64(LTCG_THRESHOLD_DAYS + 1, 'D')
+            order = np.argsort(maturity, kind='stable')
+            entry = (
+                version,
+                maturity[order],
+                np.concatenate([[0.0], np.cumsum(index.qty[order])]),
+                np.concatenate([[0.0], np.cumsum(index.cost_basis[order])]),
+            )
+            self._cache[stock] = entry
+        return entry
+
+    def eligible(self, stock: str, on_date) -> Dict:
+        """LTCG-eligible quantity and cost basis of a stock's open lots on a date"""
+        _, maturity, cum_qty, cum_cost = self._entry(stock)
+        k = np.searchsorted(maturity, np.datetime64(on_date, 'D'), side='right')
+        return {
+            'Qty': float(cum_qty[k]),
+            'Cost Basis': round(float(cum_cost[k]), 2),
+            'Total Qty': float(cum_qty[-1]),
+        }
+
+    def eligible_gain(self, stock: str, on_date, price: float) -> float:
+        """Gain that would be taxed as LTCG if the eligible quantity were sold at `price`"""
+        eligible = self.eligible(stock, on_date)
+        return round(eligible['Qty'] * price - eligible['Cost Basis'], 2)
+
+    def timeline(self, stock: str) -> pd.DataFrame:
+        """Maturity events for a stock with running eligible quantity and cost"""
+        _, maturity, cum_qty, cum_cost = self._entry(stock)
+        return pd.DataFrame({
+            'LTCG From': np.datetime_as_string(maturity),
+            'Qty': np.diff(cum_qty),
+            'Cost Basis': np.diff(cum_cost).round(2),
+            'Eligible Qty': cum_qty[1:],
+            'Eligible Cost Basis': cum_cost[1:].round(2),
+        })
+
+
+def load_price_file(price_file) -> pd.Series:
+    """Load a price snapshot CSV with 'Stock' and 'Price' columns"""
+    df = pd.read_csv(price_file, usecols=['Stock', 'Price'])
+    df['Stock'] = df['Stock'].astype(str).str.strip()
+    return df.drop_duplicates('Stock', keep='last').set_index('Stock')['Price'].astype(float)
+
+
+def summarize_valuation(positions: pd.DataFrame) -> Dict:
+    """Portfolio-level totals for a valuation produced by OpenLotIndex.value"""
+    priced = positions['Market Price'].notna()
+    return {
+        'Open Positions': len(positions),
+        'Unpriced Positions': int((~priced).sum()),
+        'Total Cost Basis': round(float(positions['Cost Basis'].sum()), 2),
+        'Total Market Value': round(float(positions.loc[priced, 'Market Value'].sum()), 2),
+        'Projected STCG': round(float(positions['Projected STCG'].sum()), 2),
+        'Projected LTCG': round(float(positions['Projected LTCG'].sum()), 2),
+    }
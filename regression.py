@@ -0,0 +1,206 @@
+"""
+Investor ITR & GST Calculator - Golden Output Regression Harness
+
+Guards calculator results against unintended changes:
+- Generates large, seeded synthetic portfolios
+- Runs them through InvestorCalculator.process_portfolio
+- Compares the summary and a hash of every results_df row against golden
+  files stored in golden/ (one compact JSON file per seed)
+- Runs seeds in parallel and reports the exact symbol and match row that
+  diverged
+
+Usage:
+    python regression.py            # check all golden seeds
+    python regression.py --update   # regenerate golden files
+"""
+
+import argparse
+import base64
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+from calculator import InvestorCalculator
+
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden')
+DEFAULT_SEEDS = [1, 2, 3, 4]
+DEFAULT_TRADES = 5000
+
+
+def generate_portfolio(seed: int, n_trades: int = DEFAULT_TRADES, n_stocks: int = 40) -> pd.DataFrame:
+    """Deterministic synthetic trade file for a seed"""
+    rng = np.random.default_rng(seed)
+    stocks = np.array([f"STK{i:03d}" for i in range(n_stocks)])
+
+    stock = rng.integers(0, n_stocks, n_trades)
+    day = np.sort(rng.integers(0, 3 * 365, n_trades))
+    # Buys slightly outnumber sells so most sells match, but some stay unmatched
+    is_buy = rng.random(n_trades) < 0.55
+    base_price = rng.uniform(50, 5000, n_stocks)
+    drift = 1 + 0.0004 * day + rng.normal(0, 0.03, n_trades)
+    price = np.round(base_price[stock] * drift, 2)
+    qty = rng.integers(1, 200, n_trades)
+    brokerage = np.round(price * qty * rng.uniform(0.0002, 0.001, n_trades), 2)
+    dividend = np.where(rng.random(n_trades) < 0.01, np.round(rng.uniform(100, 5000, n_trades), 2), 0.0)
+
+    return pd.DataFrame({
+        'Date': (pd.Timestamp('2022-01-03') + pd.to_timedelta(day, 'D')).strftime('%Y-%m-%d'),
+        'Type': np.where(is_buy, 'BUY', 'SELL'),
+        'Stock': stocks[stock],
+        'Qty': qty,
+        'Price': price,
+        'Brokerage': brokerage,
+        'Dividend': dividend,
+    })
+
+
+def seed_config(seed: int) -> Dict:
+    """Calculator options exercised by a seed (odd seeds net intraday trades, seeds from 3 on order BUY before SELL)"""
+    return {'intraday_netting': seed % 2 == 1, 'buy_before_sell': seed >= 3}
+
+
+def row_hashes(results_df: pd.DataFrame) -> np.ndarray:
+    """Stable 64-bit hash per results row, from a canonical text form of its values"""
+    if results_df.empty:
+        return np.array([], dtype=np.uint64)
+    text = None
+    for column in results_df.columns:
+        values = results_df[column].to_numpy()
+        if np.issubdtype(values.dtype, np.floating):
+            formatted = np.char.mod('%.2f', values)
+        else:
+            formatted = values.astype(str)
+        text = formatted if text is None else np.char.add(np.char.add(text, '|'), formatted)
+    return pd.util.hash_array(text.astype(object), categorize=False)
+
+
+def run_seed(seed: int, n_trades: int = DEFAULT_TRADES) -> Dict:
+    """Process the synthetic portfolio for a seed and return its comparable outputs"""
+    trades = generate_portfolio(seed, n_trades)
+    buffer = io.StringIO()
+    trades.to_csv(buffer, index=False)
+    buffer.seek(0)
+
+    calculator = InvestorCalculator(**seed_config(seed))
+    results_df, summary = calculator.process_portfolio(buffer)
+    return {
+        'seed': seed,
+        'n_trades': n_trades,
+        'config': seed_config(seed),
+        'summary': {key: float(value) for key, value in summary.items()},
+        'hashes': row_hashes(results_df),
+        'stocks': results_df['Stock'].to_numpy() if not results_df.empty else np.array([], dtype=object),
+        'results': results_df,
+    }
+
+
+def _golden_path(seed: int, golden_dir: str) -> str:
+    return os.path.join(golden_dir, f"seed_{seed}.json")
+
+
+def write_golden(seed: int, golden_dir: str = GOLDEN_DIR, n_trades: int = DEFAULT_TRADES) -> str:
+    """Run a seed and store its summary and row hashes as the golden output"""
+    run = run_seed(seed, n_trades)
+    symbols, codes = np.unique(run['stocks'].astype(str), return_inverse=True)
+    golden = {
+        'seed': seed,
+        'n_trades': n_trades,
+        'config': run['config'],
+        'summary': run['summary'],
+        'rows': len(run['hashes']),
+        'symbols': symbols.tolist(),
+        # Little-endian arrays, base64 encoded: 8 bytes per row hash, 2 per row symbol
+        'row_hashes': base64.b64encode(run['hashes'].astype('<u8').tobytes()).decode('ascii'),
+        'row_symbols': base64.b64encode(codes.astype('<u2').tobytes()).decode('ascii'),
+    }
+    os.makedirs(golden_dir, exist_ok=True)
+    path = _golden_path(seed, golden_dir)
+    with open(path, 'w') as f:
+        json.dump(golden, f, indent=1)
+        f.write('\n')
+    return path
+
+
+def check_seed(seed: int, golden_dir: str = GOLDEN_DIR) -> List[Dict]:
+    """Compare a seed against its golden file; returns a list of differences"""
+    with open(_golden_path(seed, golden_dir)) as f:
+        golden = json.load(f)
+    run = run_seed(seed, golden['n_trades'])
+    differences = []
+
+    for key in sorted(set(golden['summary']) | set(run['summary'])):
+        expected, actual = golden['summary'].get(key), run['summary'].get(key)
+        if expected is None or actual is None or abs(expected - actual) > 0.005:
+            differences.append({'seed': seed, 'kind': 'summary', 'key': key,
+                                'expected': expected, 'actual': actual})
+
+    expected_hashes = np.frombuffer(base64.b64decode(golden['row_hashes']), dtype='<u8')
+    expected_symbols = np.array(golden['symbols'], dtype=object)[
+        np.frombuffer(base64.b64decode(golden['row_symbols']), dtype='<u2')]
+    actual_hashes = run['hashes']
+    if len(expected_hashes) != len(actual_hashes):
+        differences.append({'seed': seed, 'kind': 'row_count',
+                            'expected': len(expected_hashes), 'actual': len(actual_hashes)})
+
+    common = min(len(expected_hashes), len(actual_hashes))
+    diverged = np.flatnonzero(expected_hashes[:common] != actual_hashes[:common])
+    if common < max(len(expected_hashes), len(actual_hashes)):
+        diverged = np.append(diverged, common)
+    if len(diverged):
+        row = int(diverged[0])
+        actual_row = run['results'].iloc[row].to_dict() if row < len(run['results']) else None
+        differences.append({
+            'seed': seed,
+            'kind': 'row',
+            'row': row,
+            'expected_stock': expected_symbols[row] if row < len(expected_symbols) else None,
+            'actual_stock': actual_row['Stock'] if actual_row else None,
+            'actual': actual_row,
+            'rows_diverged': int(len(diverged)),
+        })
+    return differences
+
+
+def check_all(seeds: Optional[List[int]] = None, golden_dir: str = GOLDEN_DIR,
+              workers: Optional[int] = None) -> Dict[int, List[Dict]]:
+    """Check several seeds in parallel processes; returns differences per seed"""
+    seeds = seeds if seeds is not None else DEFAULT_SEEDS
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(check_seed, seeds, [golden_dir] * len(seeds))
+        return dict(zip(seeds, results))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Golden-output regression checks for the calculator")
+    parser.add_argument('--update', action='store_true', help="regenerate the golden files")
+    parser.add_argument('--seeds', type=int, nargs='+', default=DEFAULT_SEEDS)
+    parser.add_argument('--trades', type=int, default=DEFAULT_TRADES, help="trades per seed when updating")
+    parser.add_argument('--golden-dir', default=GOLDEN_DIR)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.update:
+        for seed in args.seeds:
+            print(f"Wrote {write_golden(seed, args.golden_dir, args.trades)}")
+        return 0
+
+    failed = False
+    for seed, differences in check_all(args.seeds, args.golden_dir, args.workers).items():
+        if not differences:
+            print(f"seed {seed}: OK")
+            continue
+        failed = True
+        print(f"seed {seed}: {len(differences)} difference(s)")
+        for difference in differences:
+            print(f"  {difference}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+Investor ITR & GST Calculator - Report Model Module
+
+Turns calculator outputs into a precomputed view model for the Streamlit
+ITR and GST tabs:
+- Summary cards, rendered to HTML once
+- Per-stock gains table and GST breakdown from a single groupby
+- Vectorized currency formatting (no per-row Python formatting)
+
+The app caches the model together with the results, so a rerun only has to
+hand the prepared strings and tables to Streamlit.
+"""
+
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+
+def format_number(values, decimals: int = 0, signed: bool = False, prefix: str = '') -> np.ndarray:
+    """
+    Format numbers with thousands separators, like f"{prefix}{x:,.{decimals}f}".
+
+    With `signed`, non-negative values get a leading '+'. Works on whole
+    arrays: the digits are extracted with integer arithmetic into a
+    (rows x width) code-point matrix, which is then viewed as strings.
+    """
+    values = np.asarray(values, dtype=float)
+    if values.size == 0:
+        return np.array([], dtype=object)
+    scale = 10 ** decimals
+    magnitude = np.abs(values) * scale
+    scaled = np.rint(magnitude).astype(np.int64)
+    # Near-halfway products may round differently from the exact binary value;
+    # settle those few with Python's correctly rounded formatting
+    ties = np.flatnonzero(np.abs(magnitude % 1 - 0.5) < 1e-6)
+    for i in ties:
+        scaled[i] = int(f"{abs(values[i]):.{decimals}f}".replace('.', ''))
+
+    # Decimal digits of every value, least significant first
+    n_digits = np.floor(np.log10(np.maximum(scaled // scale, 1))).astype(np.int64) + 1
+    max_digits = int(n_digits.max()) + decimals
+    digits = np.empty((len(values), max_digits), dtype=np.uint32)
+    rest = scaled.copy()
+    for k in range(max_digits):
+        digits[:, k] = rest % 10
+        rest //= 10
+
+    int_width = n_digits + (n_digits - 1) // 3
+    frac_width = decimals + 1 if decimals > 0 else 0
+    has_sign = (values < 0) | signed
+    lengths = len(prefix) + has_sign + int_width + frac_width
+    width = int(lengths.max())
+
+    # Right-aligned layout: position p counts back from the last character.
+    # Which digit (or separator) sits at each position is the same for every row.
+    p = np.arange(width)
+    q = p - frac_width
+    is_comma = (q >= 0) & ((q + 1) % 4 == 0)
+    digit_index = np.where(q >= 0, decimals + q - q // 4, np.minimum(p, max(decimals - 1, 0)))
+    chars = digits[:, np.clip(digit_index, 0, max_digits - 1)] + ord('0')
+    chars[:, is_comma] = ord(',')
+    if decimals > 0:
+        chars[:, decimals] = ord('.')
+
+    # Row-specific parts: sign and prefix just past the integer digits
+    sign_pos = (int_width + frac_width)[:, None]
+    sign_char = np.where(values < 0, ord('-'), ord('+')).astype(np.uint32)[:, None]
+    chars = np.where((p == sign_pos) & has_sign[:, None], sign_char, chars)
+    prefix_start = sign_pos + has_sign[:, None]
+    for i, char in enumerate(reversed(prefix)):
+        chars = np.where(p == prefix_start + i, np.uint32(ord(char)), chars)
+
+    # Reverse into reading order, left-aligned (strings are NUL padded on the right)
+    source = lengths[:, None] - 1 - p
+    text = np.take_along_axis(chars, np.clip(source, 0, width - 1), axis=1)
+    text[source < 0] = 0
+    return np.ascontiguousarray(text).view(f'<U{width}').ravel().astype(object)
+
+
+def format_currency(values, decimals: int = 0, signed: bool = False) -> np.ndarray:
+    """Rupee amounts, formatted like f"₹{x:,.0f}" """
+    return format_number(values, decimals=decimals, signed=signed, prefix='₹')
+
+
+def _card_html(value: str, label: str, background: str, border: str, value_color: str,
+               label_color: str, caption: Optional[str] = None, caption_color: Optional[str] = None) -> str:
+    caption_html = (f'\n    <small style="color:{caption_color or label_color};opacity:0.9;">{caption}</small>'
+                    if caption else '')
+    return f"""
+<div style="background:{background};padding:1rem;border-radius:10px;text-align:center;border:1px solid {border};">
+    <h3 style="margin:0 0 0.25rem 0;color:{value_color};font-size:1.4rem;font-weight:800;">{value}</h3>
+    <p style="margin:0;color:{label_color};font-weight:600;">{label}</p>{caption_html}
+</div>
+"""
+
+
+class ReportModel:
+    """Precomputed cards and tables for the ITR and GST tabs"""
+
+    def __init__(self, itr_cards: List[str], taxable_income_html: str, stock_table: pd.DataFrame,
+                 gst_cards: List[str], gst_table: pd.DataFrame, gst_details: Dict[str, str]):
+        self.itr_cards = itr_cards
+        self.taxable_income_html = taxable_income_html
+        self.stock_table = stock_table
+        self.gst_cards = gst_cards
+        self.gst_table = gst_table
+        self.gst_details = gst_details
+
+
+# Row of the GST table holding brokerage on intraday (speculative) round trips
+SPECULATIVE_GST_ROW = 'Intraday (speculative)'
+
+
+def build_report_model(results_df: pd.DataFrame, summary: Dict,
+                       speculative_trades: Optional[pd.DataFrame] = None) -> ReportModel:
+    """Build the view model from a results DataFrame, its summary and any intraday round trips"""
+    # One pass over the matches for both per-stock tables
+    if results_df.empty:
+        # Every trade may have been netted as intraday
+        results_df = pd.DataFrame(columns=['Stock', 'Buy Price', 'Sell Price', 'Qty', 'Gain/Loss',
+                                           'Brokerage', 'GST on Brokerage'], dtype=float)
+    by_stock = results_df.groupby('Stock').agg(
+        buy_price=('Buy Price', 'mean'),
+        sell_price=('Sell Price', 'mean'),
+        qty=('Qty', 'sum'),
+        gain=('Gain/Loss', 'sum'),
+        brokerage=('Brokerage', 'sum'),
+        gst=('GST on Brokerage', 'sum'),
+    )
+    total_gains = float(by_stock['gain'].sum())
+    by_stock = by_stock.round(2)
+
+    gain_color = "#22c55e" if total_gains >= 0 else "#ef4444"
+    # The card puts the '+' of a gain before the rupee sign
+    gain_text = ('+' if total_gains >= 0 else '') + format_currency([total_gains])[0]
+    itr_cards = [
+        _card_html(gain_text, "Total Gains/Loss", "#ecfeff", "#bae6fd", gain_color, "#0f172a"),
+        _card_html(format_currency([summary['Total STCG']])[0], "STCG (≤ 12m)",
+                   "#fff7ed", "#fed7aa", "#c2410c", "#9a3412"),
+        _card_html(format_currency([summary['Total LTCG']])[0], "LTCG (> 12m)",
+                   "#eff6ff", "#bfdbfe", "#1d4ed8", "#1e40af"),
+    ]
+    taxable_income_html = f"""
+<div style="background:#1d4ed8;padding:1rem;border-radius:12px;text-align:center;color:#fff;border:1px solid #1e40af;">
+    <h4 style="margin:0 0 0.25rem 0;font-weight:700;">Total Taxable Income</h4>
+    <h2 style="margin:0;font-size:1.8rem;font-weight:900;">{format_currency([summary['Final Taxable Income']])[0]}</h2>
+</div>
+"""
+
+    stock_table = pd.DataFrame({
+        'Buy Price (₹)': format_currency(by_stock['buy_price']),
+        'Sell Price (₹)': format_currency(by_stock['sell_price']),
+        'Quantity': format_number(by_stock['qty']),
+        'Gain/Loss (₹)': format_currency(by_stock['gain'], signed=True),
+    }, index=by_stock.index)
+
+    brokerage = summary['Total Brokerage']
+    gst = summary['Total GST on Brokerage']
+    gst_cards = [
+        _card_html(format_currency([brokerage])[0], "Total Brokerage",
+                   "#f8fafc", "#e2e8f0", "#0f172a", "#334155", "Before GST", "#64748b"),
+        _card_html(format_currency([gst])[0], "Total GST (18%)",
+                   "#fff7ed", "#fed7aa", "#c2410c", "#9a3412", "On brokerage"),
+        _card_html(format_currency([brokerage + gst])[0], "Total with GST",
+                   "#f5f3ff", "#ddd6fe", "#5b21b6", "#6d28d9", "Brokerage + GST"),
+    ]
+
+    gst_rows = by_stock[['brokerage', 'gst']]
+    if speculative_trades is not None and not speculative_trades.empty:
+        gst_rows = pd.concat([gst_rows, pd.DataFrame({
+            'brokerage': [speculative_trades['Brokerage'].sum()],
+            'gst': [speculative_trades['GST on Brokerage'].sum()],
+        }, index=pd.Index([SPECULATIVE_GST_ROW], name=by_stock.index.name)).round(2)])
+    gst_table = pd.DataFrame({
+        'Brokerage (₹)': format_currency(gst_rows['brokerage'], decimals=2),
+        'GST Amount (₹)': format_currency(gst_rows['gst'], decimals=2),
+        'Total Cost (₹)': format_currency(gst_rows['brokerage'] + gst_rows['gst'], decimals=2),
+    }, index=gst_rows.index)
+
+    gst_details = {
+        'Brokerage Amount': f"₹{brokerage:.2f}",
+        'GST Rate': "18%",
+        'Total GST': f"₹{gst:.2f}",
+    }
+    return ReportModel(itr_cards, taxable_income_html, stock_table, gst_cards, gst_table, gst_details)
@@ -0,0 +1,218 @@
+"""
+Investor ITR & GST Calculator - Result Cache Module
+
+Content-addressed on-disk cache for process_portfolio outputs, shared by
+every process and job that points at the same directory:
+- Key: SHA-256 over the calculator version, the options and the input bytes
+- Entry: one .npy file per results column (text columns as codes plus a
+  list of distinct values) and a JSON summary, memory-mapped on a hit
+- Entries are written to a temporary directory and renamed into place, so
+  readers never see a partial entry
+- A lock file (fcntl, where available) serializes writers and eviction,
+  which drops least recently used entries beyond a size budget
+"""
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from calculator import CALCULATOR_VERSION, InvestorCalculator
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are not serialized
+    fcntl = None
+
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+META_FILE = 'meta.json'
+
+
+def _read_bytes(source) -> bytes:
+    if source is None:
+        return b''
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return f.read()
+    data = source.read()
+    source.seek(0)
+    return data.encode('utf-8') if isinstance(data, str) else data
+
+
+def cache_key(input_bytes: bytes, config: Optional[Dict] = None, *extra_inputs: bytes) -> str:
+    """Content hash of the inputs, options and calculator version"""
+    digest = hashlib.sha256()
+    digest.update(f"calculator {CALCULATOR_VERSION}\n".encode())
+    digest.update(json.dumps(config or {}, sort_keys=True, default=str).encode())
+    for data in (input_bytes,) + extra_inputs:
+        # Length-prefix each input so boundaries between them are unambiguous
+        digest.update(len(data).to_bytes(8, 'little'))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Size-bounded LRU cache of (results_df, summary) entries in a directory"""
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    @contextlib.contextmanager
+    def _lock(self):
+        with open(os.path.join(self.directory, '.lock'), 'a') as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def get(self, key: str) -> Optional[Tuple[pd.DataFrame, Dict]]:
+        """
+        Cached results for a key, memory-mapped from disk, or None.
+
+        Numeric columns stay memory-mapped copy-on-write, so they can be
+        modified in place like a miss's without touching the cache. Text columns (dates, stock, gain
+        type) are stored as codes and rebuilt from their distinct values in
+        one vectorized take, with the dtype they had when stored, so a hit
+        returns the same frame as a miss.
+        """
+        entry = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry, META_FILE)) as f:
+                meta = json.load(f)
+            columns = {}
+            for i, column in enumerate(meta['columns']):
+                values = np.load(os.path.join(entry, f"{i}.npy"), mmap_mode='c').view(np.ndarray)
+                if column['categories'] is not None:
+                    values = pd.Categorical.from_codes(values, column['categories']).astype(column['dtype'])
+                columns[column['name']] = values
+        except (FileNotFoundError, NotADirectoryError):
+            # Missing, or evicted while being read
+            return None
+
+        # Reads refresh the entry's place in the LRU order (explicit nanoseconds, as the
+        # filesystem's own clock can be too coarse to order reads just after a write)
+        try:
+            now = time.time_ns()
+            os.utime(os.path.join(entry, META_FILE), ns=(now, now))
+        except FileNotFoundError:
+            pass  # Evicted since it was read; the data already loaded is still valid
+        return pd.DataFrame(columns, copy=False), meta['summary']
+
+    def put(self, key: str, results_df: pd.DataFrame, summary: Dict):
+        """Store results under a key (no-op if another writer got there first)"""
+        entry = self._entry_dir(key)
+        if os.path.exists(entry):
+            return
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=self.directory)
+        try:
+            columns = []
+            for i, name in enumerate(results_df.columns):
+                values = results_df[name].to_numpy()
+                categories = None
+                if not np.issubdtype(values.dtype, np.number):
+                    codes, uniques = pd.factorize(results_df[name])
+                    values, categories = codes.astype(np.int32), [str(value) for value in uniques]
+                np.save(os.path.join(staging, f"{i}.npy"), np.ascontiguousarray(values))
+                columns.append({'name': name, 'categories': categories, 'dtype': str(results_df[name].dtype)})
+
+            size = sum(os.path.getsize(os.path.join(staging, f"{i}.npy")) for i in range(len(columns)))
+            meta = {'version': CALCULATOR_VERSION, 'created': time.time(), 'bytes': size,
+                    'columns': columns,
+                    'summary': {k: v.item() if hasattr(v, 'item') else v for k, v in summary.items()}}
+            with open(os.path.join(staging, META_FILE), 'w') as f:
+                json.dump(meta, f)
+
+            with self._lock():
+                if not os.path.exists(entry):
+                    os.rename(staging, entry)
+                    staging = None
+                self._evict()
+        finally:
+            if staging is not None:
+                shutil.rmtree(staging, ignore_errors=True)
+
+    def _entries(self):
+        for shard in os.listdir(self.directory):
+            shard_dir = os.path.join(self.directory, shard)
+            if shard.startswith('.') or not os.path.isdir(shard_dir):
+                continue
+            for key in os.listdir(shard_dir):
+                meta_path = os.path.join(shard_dir, key, META_FILE)
+                try:
+                    with open(meta_path) as f:
+                        size = json.load(f)['bytes']
+                    yield key, os.path.getmtime(meta_path), size
+                except (FileNotFoundError, ValueError):
+                    continue
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits its budget (caller holds the lock)"""
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        for key, _, size in entries:
+            if total <= self.max_bytes:
+                break
+            self.remove(key)
+            total -= size
+
+    def remove(self, key: str):
+        entry = self._entry_dir(key)
+        # Rename first so concurrent readers see the entry gone rather than half deleted
+        doomed = os.path.join(self.directory, f".evicted-{key}-{os.getpid()}")
+        try:
+            os.rename(entry, doomed)
+        except FileNotFoundError:
+            return
+        shutil.rmtree(doomed, ignore_errors=True)
+
+    def size_bytes(self) -> int:
+        return sum(size for _, _, size in self._entries())
+
+
+def process_portfolio_cached(csv_file, cache: ResultCache, corporate_actions_file=None,
+                             dividend_file=None, strict: bool = True,
+                             intraday_netting: bool = False, buy_before_sell: bool = False,
+                             rules: Optional[Dict] = None,
+                             opening_balance_file=None) -> Tuple[pd.DataFrame, Dict]:
+    """
+    InvestorCalculator.process_portfolio through the on-disk cache.
+
+    Inputs may be paths, bytes or file objects. `rules` is any extra
+    configuration that should separate cache entries (e.g. tax rule settings).
+    """
+    inputs = [_read_bytes(source)
+              for source in (csv_file, corporate_actions_file, dividend_file, opening_balance_file)]
+    config = {'strict': strict, 'intraday_netting': intraday_netting,
+              'buy_before_sell': buy_before_sell, 'rules': rules}
+    key = cache_key(inputs[0], config, *inputs[1:])
+
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    calculator = InvestorCalculator(intraday_netting=intraday_netting, buy_before_sell=buy_before_sell)
+    files = [io.BytesIO(data) if data else None for data in inputs]
+    results_df, summary = calculator.process_portfolio(files[0], files[1], files[2], strict=strict,
+                                                       opening_balance_file=files[3])
+    cache.put(key, results_df, summary)
+    return results_df, summary
@@ -0,0 +1,119 @@
+"""
+Investor ITR & GST Calculator - Trade Sorting Module
+
+FIFO matching needs trades in a deterministic order: by full timestamp, then
+(when configured) BUY before SELL at the same time, then by original row. This
+module provides that order:
+- O(n) detection of input that is already sorted, or exactly reversed
+- A stable multi-key NumPy lexsort otherwise
+- An on-disk external merge sort with bounded memory, for pre-sorting large
+  trade files as a separate step (the calculator still loads the whole file)
+"""
+
+import csv
+import heapq
+import os
+import tempfile
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+
+
+# Dates that cannot be parsed sort after everything else
+UNPARSED_TIME = np.iinfo(np.int64).max
+
+def trade_sort_keys(dates: pd.Series, trade_types: pd.Series,
+                    buy_before_sell: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """Timestamp (ns, so intraday times order too) and same-time rank arrays for a block of trades"""
+    parsed = pd.to_datetime(dates, errors='coerce')
+    times = parsed.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    times[parsed.isna().to_numpy()] = UNPARSED_TIME
+    if buy_before_sell:
+        # Classify the distinct Type values only, then broadcast back by code
+        codes, uniques = pd.factorize(trade_types)
+        is_sell = np.append(pd.Index(uniques.astype(str)).str.strip().str.upper() != 'BUY', True)
+        ranks = is_sell[codes].astype(np.int8)
+    else:
+        ranks = np.zeros(len(times), dtype=np.int8)
+    return times, ranks
+
+
+def _in_order(times: np.ndarray, ranks: np.ndarray, strict: bool) -> bool:
+    """Whether consecutive (time, rank) pairs never decrease (or always increase)"""
+    time_step = np.diff(times)
+    rank_step = np.diff(ranks.astype(np.int16))
+    same_time = time_step == 0
+    rank_ok = rank_step > 0 if strict else rank_step >= 0
+    return bool(np.all((time_step > 0) | (same_time & rank_ok)))
+
+
+def sort_order(times: np.ndarray, ranks: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Row order sorting by (time, rank, row), or None if the input is already in order.
+
+    Already-sorted and exactly reversed input are detected in O(n). Reversed
+    input is only accepted when no two rows tie on (time, rank), since
+    flipping tied rows would break the row-order tiebreak.
+    """
+    n = len(times)
+    if n < 2 or _in_order(times, ranks, strict=False):
+        return None
+    if _in_order(times[::-1], ranks[::-1], strict=True):
+        return np.arange(n - 1, -1, -1)
+    return np.lexsort((np.arange(n), ranks, times))
+
+
+def external_sort_csv(source, destination: str, buy_before_sell: bool = True,
+                      chunk_rows: int = 1000000, tmp_dir: Optional[str] = None) -> int:
+    """
+    Sort a trade CSV by (Date, BUY-before-SELL, row) into `destination`.
+
+    The file is read in chunks of `chunk_rows`; each chunk is sorted in
+    memory and spilled to a temporary run, and the runs are combined with a
+    streaming k-way merge, so memory use is bounded by the chunk size.
+    Returns the number of rows written.
+    """
+    runs = []
+    header = None
+    offset = 0
+    try:
+        for chunk in pd.read_csv(source, chunksize=chunk_rows, dtype=str, keep_default_na=False):
+            header = list(chunk.columns)
+            times, ranks = trade_sort_keys(chunk['Date'], chunk['Type'], buy_before_sell)
+            rows = np.arange(offset, offset + len(chunk))
+            offset += len(chunk)
+
+            order = sort_order(times, ranks)
+            if order is not None:
+                chunk, times, ranks, rows = chunk.iloc[order], times[order], ranks[order], rows[order]
+
+            keyed = chunk.copy()
+            keyed.insert(0, '__row', rows)
+            keyed.insert(0, '__rank', ranks)
+            keyed.insert(0, '__time', times)
+            handle, path = tempfile.mkstemp(suffix='.csv', dir=tmp_dir)
+            os.close(handle)
+            keyed.to_csv(path, index=False, header=False)
+            runs.append(path)
+
+        if header is None:
+            # Empty file (header only or nothing at all): copy the header through
+            pd.read_csv(source, nrows=0).to_csv(destination, index=False)
+            return 0
+
+        files = [open(path, newline='') for path in runs]
+        try:
+            readers = [csv.reader(f) for f in files]
+            merged = heapq.merge(*readers, key=lambda row: (int(row[0]), int(row[1]), int(row[2])))
+            with open(destination, 'w', newline='') as out:
+                writer = csv.writer(out)
+                writer.writerow(header)
+                for row in merged:
+                    writer.writerow(row[3:])
+        finally:
+            for f in files:
+                f.close()
+        return offset
+    finally:
+        for path in runs:
+            os.remove(path)
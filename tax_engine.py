@@ -0,0 +1,216 @@
+"""
+Investor ITR & GST Calculator - Tax Liability Engine
+
+This module turns the output of InvestorCalculator.calculate_summary into a
+tax liability breakdown:
+- Special rates for STCG (Section 111A) and LTCG (Section 112A)
+- LTCG exemption limit
+- Set-off of losses between STCG and LTCG
+- Carry-forward of capital and speculative losses across years
+- Slab rates for dividend and speculative (intraday) income
+
+All calculations are vectorized with NumPy so that a batch of clients is
+evaluated in one pass; the single-client API is a one-row batch.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+
+class TaxRules:
+    """Rates and limits used by the tax engine (defaults: FY 2025-26, new regime)"""
+
+    def __init__(self, stcg_rate: float = 0.20, ltcg_rate: float = 0.125,
+                 ltcg_exemption: float = 125000.0, cess_rate: float = 0.04,
+                 slabs: Optional[List[Tuple[float, float]]] = None):
+        self.stcg_rate = stcg_rate
+        self.ltcg_rate = ltcg_rate
+        self.ltcg_exemption = ltcg_exemption
+        self.cess_rate = cess_rate
+        # (lower bound, rate) pairs, sorted by lower bound
+        self.slabs = slabs if slabs is not None else [
+            (0, 0.0),
+            (400000, 0.05),
+            (800000, 0.10),
+            (1200000, 0.15),
+            (1600000, 0.20),
+            (2000000, 0.25),
+            (2400000, 0.30),
+        ]
+
+    def slab_tax(self, income: np.ndarray) -> np.ndarray:
+        """Tax on income at slab rates (vectorized over clients)"""
+        lowers = np.array([lower for lower, _ in self.slabs], dtype=float)
+        rates = np.array([rate for _, rate in self.slabs], dtype=float)
+        uppers = np.append(lowers[1:], np.inf)
+
+        income = np.asarray(income, dtype=float)[:, None]
+        taxed_in_slab = np.clip(income - lowers, 0, uppers - lowers)
+        return taxed_in_slab @ rates
+
+
+# Columns every summary row must provide; optional columns default to 0
+BATCH_INPUT_COLUMNS = ['Total STCG', 'Total LTCG', 'Total Dividends']
+
+
+def _optimal_stcl_split(stcl: np.ndarray, stcg: np.ndarray, ltcg: np.ndarray,
+                        rules: TaxRules) -> np.ndarray:
+    """
+    Choose how much of a short-term loss pool to set off against STCG (the rest
+    goes to LTCG), minimising special-rate tax for every client at once.
+
+    Tax as a function of the STCG share is convex and piecewise linear, so the
+    optimum is at a bound or at the kink where taxable LTCG reaches the
+    exemption limit. All three candidates are evaluated and the cheapest wins.
+    """
+    hi = np.minimum(stcl, stcg)
+    lo = np.minimum(np.maximum(0.0, stcl - ltcg), hi)
+    kink = np.clip(stcl - np.maximum(ltcg - rules.ltcg_exemption, 0.0), lo, hi)
+    candidates = np.stack([hi, lo, kink])
+
+    stcg_left = np.maximum(stcg - candidates, 0.0)
+    ltcg_left = np.maximum(ltcg - (stcl - candidates), 0.0)
+    tax = (stcg_left * rules.stcg_rate
+           + np.maximum(ltcg_left - rules.ltcg_exemption, 0.0) * rules.ltcg_rate)
+
+    best = np.argmin(tax, axis=0)
+    return candidates[best, np.arange(candidates.shape[1])]
+
+
+def compute_batch_liability(summaries: pd.DataFrame, rules: Optional[TaxRules] = None) -> pd.DataFrame:
+    """
+    Compute the tax liability breakdown for many clients at once.
+
+    `summaries` has one row per client with the calculate_summary columns
+    'Total STCG', 'Total LTCG' and 'Total Dividends', plus optional
+    'Speculative Income', 'Other Income', 'STCL Brought Forward',
+    'LTCL Brought Forward' and 'Speculative Loss Brought Forward'.
+    Returns one row of line items per client, aligned to the input index.
+    """
+    rules = rules or TaxRules()
+
+    missing_columns = [col for col in BATCH_INPUT_COLUMNS if col not in summaries.columns]
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {missing_columns}")
+
+    def column(name):
+        if name in summaries.columns:
+            return summaries[name].fillna(0).to_numpy(dtype=float)
+        return np.zeros(len(summaries))
+
+    stcg = column('Total STCG')
+    ltcg = column('Total LTCG')
+    dividends = column('Total Dividends')
+    speculative = column('Speculative Income')
+    other_income = column('Other Income')
+    bf_stcl = np.maximum(column('STCL Brought Forward'), 0.0)
+    bf_ltcl = np.maximum(column('LTCL Brought Forward'), 0.0)
+    bf_speculative_loss = np.maximum(column('Speculative Loss Brought Forward'), 0.0)
+
+    # Current-year losses: net STCG/LTCG below zero
+    current_stcl = np.maximum(-stcg, 0.0)
+    current_ltcl = np.maximum(-ltcg, 0.0)
+    stcg = np.maximum(stcg, 0.0)
+    ltcg = np.maximum(ltcg, 0.0)
+
+    # Current-year STCL can only be absorbed by LTCG (STCG is already netted)
+    used = np.minimum(current_stcl, ltcg)
+    ltcg = ltcg - used
+    stcl_left = current_stcl - used
+
+    # Brought-forward LTCL can only be set off against LTCG
+    used_bf_ltcl = np.minimum(bf_ltcl, ltcg)
+    ltcg = ltcg - used_bf_ltcl
+    ltcl_carried = current_ltcl + bf_ltcl - used_bf_ltcl
+
+    # Brought-forward STCL may go against either; split it optimally
+    to_stcg = _optimal_stcl_split(bf_stcl, stcg, ltcg, rules)
+    to_ltcg = np.minimum(bf_stcl - to_stcg, ltcg)
+    stcg = stcg - to_stcg
+    ltcg = ltcg - to_ltcg
+    stcl_carried = stcl_left + bf_stcl - to_stcg - to_ltcg
+
+    exemption = np.minimum(ltcg, rules.ltcg_exemption)
+    taxable_ltcg = ltcg - exemption
+
+    stcg_tax = stcg * rules.stcg_rate
+    ltcg_tax = taxable_ltcg * rules.ltcg_rate
+    # Dividends are taxed at the marginal slab rates on top of other income
+    dividend_tax = rules.slab_tax(other_income + dividends) - rules.slab_tax(other_income)
+
+    # Speculative losses can only be set off against speculative income, now or in later years
+    speculative_income = np.maximum(speculative, 0.0)
+    used_speculative_loss = np.minimum(bf_speculative_loss, speculative_income)
+    speculative_income = speculative_income - used_speculative_loss
+    speculative_loss_carried = np.maximum(-speculative, 0.0) + bf_speculative_loss - used_speculative_loss
+    slab_base = other_income + dividends
+    speculative_tax = rules.slab_tax(slab_base + speculative_income) - rules.slab_tax(slab_base)
+
+    tax_before_cess = stcg_tax + ltcg_tax + dividend_tax + speculative_tax
+    cess = tax_before_cess * rules.cess_rate
+
+    breakdown = pd.DataFrame({
+        'STCG after Set-off': stcg,
+        'STCG Tax (111A)': stcg_tax,
+        'LTCG after Set-off': ltcg,
+        'LTCG Exemption': exemption,
+        'Taxable LTCG': taxable_ltcg,
+        'LTCG Tax (112A)': ltcg_tax,
+        'Dividend Income': dividends,
+        'Dividend Tax (Slab)': dividend_tax,
+        'Speculative Income': speculative_income,
+        'Speculative Tax (Slab)': speculative_tax,
+        'Tax before Cess': tax_before_cess,
+        'Health & Education Cess': cess,
+        'Total Tax Liability': tax_before_cess + cess,
+        'STCL Carried Forward': stcl_carried,
+        'LTCL Carried Forward': ltcl_carried,
+        'Speculative Loss Carried Forward': speculative_loss_carried,
+    }, index=summaries.index)
+    return breakdown.round(2)
+
+
+def compute_tax_liability(summary: Dict, rules: Optional[TaxRules] = None,
+                          brought_forward: Optional[Dict] = None,
+                          other_income: float = 0) -> Dict:
+    """
+    Compute the tax liability breakdown for a single calculate_summary dict.
+
+    `brought_forward` may carry 'STCL', 'LTCL' and 'Speculative' losses from earlier years.
+    """
+    brought_forward = brought_forward or {}
+    row = {
+        'Total STCG': summary.get('Total STCG', 0),
+        'Total LTCG': summary.get('Total LTCG', 0),
+        'Total Dividends': summary.get('Total Dividends', 0),
+        'Speculative Income': summary.get('Speculative Income', 0),
+        'Other Income': other_income,
+        'STCL Brought Forward': brought_forward.get('STCL', 0),
+        'LTCL Brought Forward': brought_forward.get('LTCL', 0),
+        'Speculative Loss Brought Forward': brought_forward.get('Speculative', 0),
+    }
+    breakdown = compute_batch_liability(pd.DataFrame([row]), rules)
+    return {key: float(value) for key, value in breakdown.iloc[0].items()}
+
+
+def compute_multi_year_liability(summaries_by_year: Dict[str, Dict],
+                                 rules: Optional[TaxRules] = None,
+                                 brought_forward: Optional[Dict] = None) -> Dict[str, Dict]:
+    """
+    Compute liabilities for consecutive years, carrying unabsorbed losses forward.
+
+    `summaries_by_year` maps a year label (e.g. 'FY 2024-25') to a summary
+    dict; years are processed in sorted label order.
+    """
+    carried = dict(brought_forward or {})
+    results = {}
+    for year in sorted(summaries_by_year):
+        liability = compute_tax_liability(summaries_by_year[year], rules, carried)
+        results[year] = liability
+        carried = {
+            'STCL': liability['STCL Carried Forward'],
+            'LTCL': liability['LTCL Carried Forward'],
+            'Speculative': liability['Speculative Loss Carried Forward'],
+        }
+    return results
@@ -0,0 +1,208 @@
+"""
+Investor ITR & GST Calculator - Data Validation Module
+
+This module checks an uploaded trade file in one vectorized pass and
+reports every problem at once instead of stopping at the first bad row:
+- Errors (row cannot be used): bad Type, negative, non-numeric or infinite
+  quantities/prices/dividends, fractional quantities, zero quantities on
+  rows without a dividend, unparsable dates, missing stock names
+- Warnings (row is used but suspicious): duplicate rows, sells before any
+  buy of the stock, prices far outside the stock's rolling range
+
+Each issue carries the row index, category and offending value so the UI
+can show a structured report.
+"""
+
+from typing import Dict, Tuple
+import numpy as np
+import pandas as pd
+
+
+REQUIRED_COLUMNS = ['Date', 'Type', 'Stock', 'Qty', 'Price', 'Brokerage']
+
+# Category -> (severity, message)
+ISSUE_CATEGORIES = {
+    'invalid_type': ('error', "Type must be BUY or SELL"),
+    'invalid_date': ('error', "Date could not be parsed"),
+    'missing_stock': ('error', "Stock name is missing"),
+    'invalid_number': ('error', "Value is not a number"),
+    'negative_value': ('error', "Value must not be negative"),
+    'fractional_qty': ('error', "Quantity must be a whole number of shares"),
+    'zero_qty': ('error', "Quantity is zero and the row has no dividend"),
+    'invalid_dividend': ('error', "Dividend must be a non-negative number"),
+    'duplicate_row': ('warning', "Row duplicates an earlier row"),
+    'sell_before_buy': ('warning', "Sell is dated before any buy of this stock"),
+    'price_outlier': ('warning', "Price is far outside the stock's rolling range"),
+}
+
+REPORT_COLUMNS = ['Row', 'Line', 'Category', 'Severity', 'Column', 'Value', 'Message']
+
+
+class ValidationReport:
+    """Structured list of data issues found in a trade file"""
+
+    def __init__(self, issues: pd.DataFrame, total_rows: int):
+        self.issues = issues
+        self.total_rows = total_rows
+
+    def __len__(self):
+        return len(self.issues)
+
+    @property
+    def errors(self) -> pd.DataFrame:
+        return self.issues[self.issues['Severity'] == 'error']
+
+    @property
+    def warnings(self) -> pd.DataFrame:
+        return self.issues[self.issues['Severity'] == 'warning']
+
+    @property
+    def has_errors(self) -> bool:
+        return not self.errors.empty
+
+    @property
+    def error_rows(self) -> np.ndarray:
+        """Indices of rows that cannot be processed"""
+        return np.unique(self.errors['Row'].to_numpy())
+
+    def summary(self) -> Dict[str, int]:
+        """Number of issues per category"""
+        return self.issues['Category'].value_counts().to_dict()
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return self.issues.copy()
+
+    def drop_issues(self, category: str, rows):
+        """Remove one category's issues on the given rows (e.g. once other data resolves them)"""
+        resolved = self.issues['Category'].eq(category) & self.issues['Row'].isin(rows)
+        self.issues = self.issues[~resolved].reset_index(drop=True)
+
+    def __str__(self):
+        counts = ', '.join(f"{category}: {count}" for category, count in self.summary().items())
+        return f"{len(self.errors)} error(s), {len(self.warnings)} warning(s) in {self.total_rows} rows ({counts})"
+
+
+class ValidationError(ValueError):
+    """Raised in strict mode when a trade file has rows that cannot be processed"""
+
+    def __init__(self, report: ValidationReport):
+        self.report = report
+        super().__init__(f"Invalid trade data: {report}")
+
+
+def _parse_dates(values: pd.Series) -> pd.Series:
+    dates = pd.to_datetime(values, errors='coerce')
+    # Rows that don't match the inferred format get a second, per-element pass
+    retry = dates.isna() & values.notna()
+    if retry.any():
+        dates[retry] = pd.to_datetime(values[retry].astype(str), errors='coerce', format='mixed')
+    return dates
+
+
+def _clean_text(values: pd.Series, upper: bool = False) -> Tuple[pd.Series, np.ndarray]:
+    """
+    Strip (and optionally upper-case) text, working on distinct values only.
+
+    Also returns an integer code per row (-1 for missing) for cheap grouping.
+    """
+    codes, uniques = pd.factorize(values)
+    cleaned = pd.Index(uniques.astype(str)).str.strip()
+    if upper:
+        cleaned = cleaned.str.upper()
+    # Values that only differed by whitespace/case share a code after cleaning
+    clean_codes, clean_uniques = pd.factorize(cleaned)
+    codes = np.where(codes >= 0, clean_codes[codes], -1)
+    # Code -1 (missing) picks the trailing None
+    lookup = np.append(np.asarray(clean_uniques, dtype=object), None)
+    return pd.Series(lookup[codes], index=values.index, dtype=object), codes
+
+
+def _issues(mask: pd.Series, category: str, column: str, values: pd.Series) -> pd.DataFrame:
+    severity, message = ISSUE_CATEGORIES[category]
+    rows = mask[mask].index
+    return pd.DataFrame({
+        'Row': rows,
+        'Line': rows + 2,  # 1-based CSV line, after the header
+        'Category': category,
+        'Severity': severity,
+        'Column': column,
+        'Value': values.loc[rows].astype(str).to_numpy(),
+        'Message': message,
+    })
+
+
+def validate_trades(df: pd.DataFrame, outlier_window: int = 21,
+                    outlier_factor: float = 5.0) -> Tuple[pd.DataFrame, ValidationReport]:
+    """
+    Validate and normalise a raw trade DataFrame.
+
+    Returns the parsed trades (Date as datetime, Type upper-cased, numeric
+    columns coerced, Dividend defaulting to 0, plus a stripped Broker when
+    the file has that optional column) together with the report.
+    A price is an outlier when it is more than `outlier_factor` times above
+    or below the rolling median of the stock's prices over `outlier_window`
+    trades.
+    """
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {missing_columns}")
+
+    df = df.reset_index(drop=True)
+    trade_types, _ = _clean_text(df['Type'], upper=True)
+    stocks, stock_codes = _clean_text(df['Stock'])
+    raw_dividend = df['Dividend'] if 'Dividend' in df.columns else pd.Series(np.nan, index=df.index)
+    dividend = pd.to_numeric(raw_dividend, errors='coerce')
+    parsed = pd.DataFrame({
+        'Date': _parse_dates(df['Date']),
+        'Type': trade_types,
+        'Stock': stocks,
+        'Qty': pd.to_numeric(df['Qty'], errors='coerce'),
+        'Price': pd.to_numeric(df['Price'], errors='coerce'),
+        'Brokerage': pd.to_numeric(df['Brokerage'], errors='coerce'),
+        'Dividend': dividend.fillna(0.0),
+    })
+    if 'Broker' in df.columns:
+        parsed['Broker'], _ = _clean_text(df['Broker'])
+
+    found = [
+        _issues(~parsed['Type'].isin(['BUY', 'SELL']), 'invalid_type', 'Type', df['Type']),
+        _issues(parsed['Date'].isna(), 'invalid_date', 'Date', df['Date']),
+        _issues(parsed['Stock'].isna() | parsed['Stock'].eq(''), 'missing_stock', 'Stock', df['Stock']),
+    ]
+    for column in ['Qty', 'Price', 'Brokerage']:
+        found.append(_issues(~np.isfinite(parsed[column]), 'invalid_number', column, df[column]))
+        found.append(_issues(parsed[column] < 0, 'negative_value', column, df[column]))
+    # Quantities become whole shares; a zero quantity is only meaningful on a dividend row
+    found.append(_issues(np.isfinite(parsed['Qty']) & (parsed['Qty'] % 1 != 0), 'fractional_qty', 'Qty', df['Qty']))
+    found.append(_issues(parsed['Qty'].eq(0) & ~(parsed['Dividend'] > 0), 'zero_qty', 'Qty', df['Qty']))
+    # A blank dividend means none; anything else must parse
+    found.append(_issues((dividend.isna() & raw_dividend.notna()) | (dividend < 0),
+                         'invalid_dividend', 'Dividend', raw_dividend))
+
+    # Warnings that depend on dates and prices only look at otherwise valid rows
+    errors = pd.concat(found, ignore_index=True)
+    valid = ~parsed.index.isin(errors['Row'])
+    rows = parsed[valid]
+    stock_key = pd.Series(stock_codes, index=parsed.index)[valid]
+
+    found.append(_issues(df.duplicated(subset=REQUIRED_COLUMNS), 'duplicate_row', 'Date', df['Date']))
+
+    is_buy = rows['Type'].eq('BUY')
+    first_buy = rows['Date'].where(is_buy).groupby(stock_key).transform('min')
+    early_sell = pd.Series(False, index=parsed.index)
+    early_sell[rows.index] = ~is_buy & (first_buy.isna() | (rows['Date'] < first_buy))
+    found.append(_issues(early_sell, 'sell_before_buy', 'Date', df['Date']))
+
+    priced = rows[(rows['Price'] > 0) & (rows['Qty'] > 0)].assign(Key=stock_key)
+    priced = priced.sort_values(['Key', 'Date'], kind='stable')
+    median = (priced.groupby('Key')['Price']
+              .rolling(outlier_window, min_periods=3, center=True).median()
+              .reset_index(level=0, drop=True))
+    ratio = priced['Price'] / median.reindex(priced.index)
+    outlier = pd.Series(False, index=parsed.index)
+    outlier[priced.index] = (ratio > outlier_factor) | (ratio < 1 / outlier_factor)
+    found.append(_issues(outlier, 'price_outlier', 'Price', df['Price']))
+
+    issues = pd.concat(found, ignore_index=True)
+    issues = issues.sort_values(['Row', 'Severity'], kind='stable').reset_index(drop=True)
+    return parsed, ValidationReport(issues[REPORT_COLUMNS], len(df))